@@ -49,6 +49,71 @@ contract MerkleDistributor is IMerkleDistributor {
         emit Claimed(index, account, amount);
     }
 
+    // Claims in one transaction, as parallel arrays. The proof of claim i is the next
+    // proofLengths[i] nodes of proofs. Consecutive claims in the same bitmap word, as in
+    // a batch sorted by index, set their bits in memory and write the word once.
+    function claimMany(
+        uint256[] memory indices,
+        address[] memory accounts,
+        uint256[] memory amounts,
+        bytes32[] memory proofs,
+        uint256[] memory proofLengths
+    ) public override {
+        require(
+            accounts.length == indices.length && amounts.length == indices.length && proofLengths.length == indices.length,
+            'MerkleDistributor: Length mismatch.'
+        );
+        uint256 wordIndex;
+        uint256 word;
+        uint256 proofStart;
+        for (uint256 i = 0; i < indices.length; i++) {
+            uint256 index = indices[i];
+            if (i == 0 || index / 256 != wordIndex) {
+                if (i > 0) {
+                    claimedBitMap[wordIndex] = word;
+                }
+                wordIndex = index / 256;
+                word = claimedBitMap[wordIndex];
+            }
+            {
+                uint256 mask = (1 << (index % 256));
+                require(word & mask == 0, 'MerkleDistributor: Drop already claimed.');
+                word = word | mask;
+            }
+
+            // proofStart never passes proofs.length, so the subtraction cannot wrap.
+            require(proofLengths[i] <= proofs.length - proofStart, 'MerkleDistributor: Length mismatch.');
+            uint256 proofEnd = proofStart + proofLengths[i];
+            bytes32 node = keccak256(abi.encodePacked(index, accounts[i], amounts[i]));
+            require(_verify(proofs, proofStart, proofEnd, node), 'MerkleDistributor: Invalid proof.');
+            proofStart = proofEnd;
+        }
+        require(proofStart == proofs.length, 'MerkleDistributor: Length mismatch.');
+        if (indices.length > 0) {
+            claimedBitMap[wordIndex] = word;
+        }
+
+        // Every claim is marked before any token moves.
+        for (uint256 i = 0; i < indices.length; i++) {
+            require(IERC20(token).transfer(accounts[i], amounts[i]), 'MerkleDistributor: Transfer failed.');
+            emit Claimed(indices[i], accounts[i], amounts[i]);
+        }
+    }
+
+    // MerkleProof.verify over the nodes proofs[start:end].
+    function _verify(bytes32[] memory proofs, uint256 start, uint256 end, bytes32 leaf) private view returns (bool) {
+        bytes32 computedHash = leaf;
+        for (uint256 i = start; i < end; i++) {
+            bytes32 proofElement = proofs[i];
+            if (computedHash <= proofElement) {
+                computedHash = keccak256(abi.encodePacked(computedHash, proofElement));
+            } else {
+                computedHash = keccak256(abi.encodePacked(proofElement, computedHash));
+            }
+        }
+        return computedHash == merkleRoot;
+    }
+
     function fold() public {
         require(block.timestamp >= unlock, 'MerkleDistributor: Claim period has not passed.');
         uint amount = IERC20(token).balanceOf(address(this));
@@ -11,6 +11,15 @@ interface IMerkleDistributor {
     function isClaimed(uint256 index) external view returns (bool);
     // Claim the given amount of the token to the given address. Reverts if the inputs are invalid.
     function claim(uint256 index, address account, uint256 amount, bytes32[] calldata merkleProof) external;
+    // Claim several drops in one transaction. The proof of claim i is the next proofLengths[i]
+    // nodes of proofs. Reverts if any of the claims is invalid.
+    function claimMany(
+        uint256[] calldata indices,
+        address[] calldata accounts,
+        uint256[] calldata amounts,
+        bytes32[] calldata proofs,
+        uint256[] calldata proofLengths
+    ) external;
 
     // This event is triggered whenever a call to #claim succeeds.
     event Claimed(uint256 index, address account, uint256 amount);
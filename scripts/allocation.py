@@ -0,0 +1,97 @@
+import heapq
+from collections import Counter
+
+
+def allocate(total, weights):
+    """
+    Split `total` in proportion to integer `weights`, exactly.
+
+    Each share is floored, then the units left over go one each to the largest
+    remainders, ties going to the earlier weight. Returns a list of ints that
+    sums to `total`, using only integer arithmetic.
+    """
+    total = int(total)
+    weights = list(weights)
+    denominator = sum(weights)
+    if denominator <= 0:
+        raise ValueError("weights must have a positive sum")
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total * weight, denominator)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total - sum(shares)
+    for i in heapq.nlargest(leftover, range(len(weights)), key=remainders.__getitem__):
+        shares[i] += 1
+    return shares
+
+
+def allocate_to(total, amounts):
+    """
+    `allocate` over a {recipient: weight} mapping.
+    """
+    return dict(zip(amounts, allocate(total, amounts.values())))
+
+
+class Buckets:
+    """
+    Weights of every recipient in each bucket, as lists aligned to one list of
+    recipients, so a scenario only changes the totals, dust and exclusions.
+    """
+
+    def __init__(self, buckets):
+        self.recipients = list(
+            dict.fromkeys(user for weights in buckets.values() for user in weights)
+        )
+        index = {user: i for i, user in enumerate(self.recipients)}
+        self.weights = {}
+        for name, weights in buckets.items():
+            column = [0] * len(self.recipients)
+            for user, weight in weights.items():
+                column[index[user]] = weight
+            self.weights[name] = column
+        self.cache = {}
+
+    def shares(self, name, total, excluded):
+        """
+        Allocation of one bucket, cached since scenarios often share it.
+        """
+        key = (name, total, excluded)
+        if key not in self.cache:
+            weights = [
+                0 if user in excluded else weight
+                for user, weight in zip(self.recipients, self.weights[name])
+            ]
+            self.cache[key] = allocate(total, weights)
+        return self.cache[key]
+
+    def distribute(self, totals, dust, excluded=()):
+        """
+        Allocate `totals[name]` over bucket `name`, drop recipients below `dust`
+        and allocate the sum of `totals` over the rest.
+        Returns {recipient: amount}, largest first.
+        """
+        excluded = frozenset(excluded)
+        buckets = [self.shares(name, total, excluded) for name, total in totals.items()]
+        amounts = list(map(sum, zip(*buckets)))
+        kept = [i for i, amount in enumerate(amounts) if amount and amount >= dust]
+        final = allocate(sum(totals.values()), [amounts[i] for i in kept])
+        ranked = sorted(zip(kept, final), key=lambda item: -item[1])
+        return {self.recipients[i]: amount for i, amount in ranked if amount}
+
+
+def stage_buckets(points, staked_balances, snapshot_balances):
+    """
+    Points, staked and snapshot bucket weights from the cached stage artifacts.
+    """
+    buckets = {"points": Counter(), "staked": Counter(), "snapshot": Counter()}
+    for period in points:
+        for user, amount in points[period].items():
+            buckets["points"][user] += amount
+    for period in staked_balances:
+        for user, amount in staked_balances[period]["stakers"].items():
+            buckets["staked"][user] += amount
+    for user, amount in snapshot_balances.items():
+        buckets["snapshot"][user] += amount
+    return Buckets(buckets)
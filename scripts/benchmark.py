@@ -0,0 +1,614 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from functools import wraps
+from itertools import zip_longest
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+
+from eth_utils import encode_hex, event_abi_to_log_topic
+from eth_utils import keccak as eth_keccak
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+
+from scripts import ledger
+from scripts.columnar import load_columns, write_columns
+from scripts.ledger import ZERO_ADDRESS, apply_transfer
+from scripts.merkle import MerkleTree, build_layers, keccak
+from scripts.verify import verify
+
+MERKLE_SIZES = [1_000, 100_000, 1_000_000]
+LEGACY_SAMPLE = 100
+STAGE_SCALES = [10_000, 100_000]  # holders, anything up to 10M works given the memory
+BASELINES_DIR = "snapshot/benchmarks"
+# NOTE: stage times are compared in units of the calibration loop, which carry
+# over between machines far better than seconds, tracemalloc peaks barely vary
+TIME_TOLERANCE = 2.0
+MEMORY_TOLERANCE = 1.25
+REPEAT = 3  # timed rounds per stage, the fastest counts
+MIN_TIME = 0.2  # seconds per round, shorter stages are repeated until they reach it
+PERIODS = 50
+PERIOD_BLOCKS = 40_000
+CONTRACT_SHARE = 200  # one holder in this many has code
+LPS = 50  # liquidity providers per pool
+CODE_SIZE = 9000
+ZERO_HASH = HexBytes(bytes(32))
+SPANK = "0x42d6622deCe394b54999Fbd73D108123806f6a18"
+SPANKBANK = "0x1ECB60873E495dDFa2a13A8F4140e490dd574E6F"
+# NOTE: the holder calc_spank credits with the balance its logs miss
+SPANK_DEPLOYER = "0xA7f00de671ebEB1b04C19a00842ff1d980847f0B"
+
+
+def main():
+    merkle_build()
+    merkle_proofs()
+    stages()
+
+
+def stages(scale=None, save=False):
+    """
+    Time every pipeline stage on synthetic fixtures of `scale` holders and
+    compare relative time and peak memory with the stored baselines.
+
+    Pass `save` to store the results as the new baselines instead.
+    """
+    scales = [int(scale)] if scale else STAGE_SCALES
+    calibration = calibrate()
+    print(f"calibration loop {calibration * 1e3:.1f}ms")
+    regressions = []
+    for size in scales:
+        results = run_stages(size, calibration)
+        path = Path(BASELINES_DIR) / f"{size}.json"
+        if save in {True, "true", "save"}:
+            os.makedirs(path.parent, exist_ok=True)
+            json.dump(results, path.open("wt"), indent=2)
+            print(f"baseline written to {path}")
+        elif path.exists():
+            regressions += compare(results, json.load(path.open()), size)
+        else:
+            print(f"no baseline for {size} holders, run with save to record one")
+    if regressions:
+        raise AssertionError("performance regressions:\n" + "\n".join(regressions))
+
+
+def synthetic_leaves(size, seed=0):
+    """
+    Random packed (index, account, amount) leaves, same width as the real ones.
+    """
+    rng = random.Random(seed)
+    return [
+        encode_hex(
+            index.to_bytes(32, "big")
+            + rng.getrandbits(160).to_bytes(20, "big")
+            + rng.getrandbits(96).to_bytes(32, "big")
+        )
+        for index in range(size)
+    ]
+
+
+def legacy_get_proof(tree, el):
+    # NOTE: proof lookup as it was before the position index, kept for comparison
+    idx = tree.elements.index(tree.leaves[el])
+    proof = []
+    for layer in tree.layers:
+        pair_idx = idx + 1 if idx % 2 == 0 else idx - 1
+        if pair_idx < len(layer):
+            proof.append(encode_hex(layer[pair_idx]))
+        idx //= 2
+    return proof
+
+
+def legacy_layers(elements):
+    # NOTE: layer building as it was before batching, kept as the reference
+    layers = [elements]
+    while len(layers[-1]) > 1:
+        layer = layers[-1]
+        layers.append(
+            [combined_hash(a, b) for a, b in zip_longest(layer[::2], layer[1::2])]
+        )
+    return layers
+
+
+def combined_hash(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return eth_keccak(b"".join(sorted([a, b])))
+
+
+def merkle_proofs(sizes=None):
+    """
+    Compare per-claimant proof lookup with the bulk path.
+
+    The legacy method is quadratic, so it is timed on a sample of leaves
+    and extrapolated to the full tree.
+    """
+    sizes = sizes or MERKLE_SIZES
+    for size in sizes:
+        nodes = synthetic_leaves(size)
+        start = perf_counter()
+        tree = MerkleTree(nodes)
+        build = perf_counter() - start
+
+        start = perf_counter()
+        proofs = tree.get_all_proofs()
+        bulk = perf_counter() - start
+
+        sample = random.Random(size).sample(range(size), min(LEGACY_SAMPLE, size))
+        start = perf_counter()
+        for idx in sample:
+            assert legacy_get_proof(tree, idx) == proofs[idx]
+        legacy = (perf_counter() - start) / len(sample) * size
+
+        print(
+            f"{size:>9} leaves  build {build:8.2f}s  "
+            f"bulk proofs {bulk:8.2f}s  legacy proofs ~{legacy:10.2f}s  "
+            f"speedup x{legacy / bulk:,.0f}"
+        )
+
+
+def merkle_build(sizes=None):
+    """
+    Compare the per-node `combined_hash` layers with the batched builder.
+    """
+    sizes = sizes or MERKLE_SIZES
+    for size in sizes:
+        tree = MerkleTree(synthetic_leaves(size))
+
+        start = perf_counter()
+        layers = legacy_layers(tree.elements)
+        legacy = perf_counter() - start
+
+        start = perf_counter()
+        assert build_layers(tree.elements) == layers
+        batched = perf_counter() - start
+
+        print(
+            f"{size:>9} leaves  legacy layers {legacy:8.2f}s  "
+            f"batched layers {batched:8.2f}s  speedup x{legacy / batched:,.1f}"
+        )
+
+
+def run_stages(size, calibration, seed=0):
+    """
+    Generate a synthetic chain for `size` holders and measure each stage on it.
+    """
+    from scripts import snapshot
+
+    stage = {name: snapshot.STAGES[name]["func"] for name in snapshot.STAGES}
+    chain = synthetic_chain(size, snapshot, seed)
+    with offline_stages(snapshot, chain) as tmp:
+        return measure_stages(stage, chain, calibration, tmp)
+
+
+def measure_stages(stage, chain, calibration, tmp):
+    results = {}
+
+    def run(name, items, func, *args):
+        return measure(results, name, items, calibration, func, *args)
+
+    logs = chain["staking_logs"]
+    events = run("decode_logs", len(logs), stage["decode_logs"], logs)
+    # NOTE: later stages get events from the column store, as in a snapshot
+    path = Path(tmp) / "events.columns"
+    write_columns(events, path, chain["spankbank_abi"])
+    store = load_columns(path)
+    points = run(
+        "calc_spankbank_points", len(store), stage["calc_spankbank_points"], store
+    )
+    staked = run(
+        "calc_spankbank_spank", len(store), stage["calc_spankbank_spank"], store
+    )
+    balances = run(
+        "calc_spank", len(chain["logs"][SPANK]), fresh_ledgers(stage["calc_spank"])
+    )
+    contracts = run("find_contracts", len(balances), stage["find_contracts"], balances)
+    lp_logs = sum(len(chain["logs"][pool]) for pool in chain["pools"])
+    replacements = run(
+        "calc_uniswap", lp_logs, fresh_ledgers(stage["calc_uniswap"]), contracts
+    )
+    unwrapped = run(
+        "unwrap_balances",
+        len(balances),
+        stage["unwrap_balances"],
+        balances,
+        replacements,
+    )
+    distribution = run(
+        "prepare_distribution",
+        len(unwrapped),
+        stage["prepare_distribution"],
+        points,
+        staked,
+        unwrapped,
+    )
+    tree = run(
+        "prepare_merkle_tree",
+        len(distribution),
+        stage["prepare_merkle_tree"],
+        distribution,
+    )
+    run("verify", len(distribution), verify, tree)
+    return results
+
+
+def calibrate():
+    """
+    Time of a fixed mix of hashing, dict and integer work, the unit stage
+    times are stored in so baselines recorded on one machine hold on another.
+    """
+
+    def workload():
+        totals = Counter()
+        for i in range(20_000):
+            digest = keccak(i.to_bytes(32, "big"))
+            totals[digest[:2]] += int.from_bytes(digest, "big") % 10 ** 18
+        return totals
+
+    return best_time(workload)[0]
+
+
+def best_time(func, *args):
+    """
+    Fastest time per call over `REPEAT` rounds, each calling `func(*args)`
+    until it has run for `MIN_TIME`. Dict arguments are shallow-copied for
+    every call, since some stages mutate them. Returns the time and a result.
+
+    What the stage prints is still formatted, but goes to /dev/null.
+    """
+    elapsed = float("inf")
+    with open(os.devnull, "w") as null, redirect_stdout(null):
+        for _ in range(REPEAT):
+            calls, total = 0, 0.0
+            while not calls or total < MIN_TIME:
+                copies = [arg.copy() if isinstance(arg, dict) else arg for arg in args]
+                start = perf_counter()
+                result = func(*copies)
+                total += perf_counter() - start
+                calls += 1
+            elapsed = min(elapsed, total / calls)
+    return elapsed, result
+
+
+def measure(results, name, items, calibration, func, *args):
+    """
+    Best time of `func(*args)`, then one more run under tracemalloc for its
+    peak memory.
+    """
+    elapsed, result = best_time(func, *args)
+    copies = [arg.copy() if isinstance(arg, dict) else arg for arg in args]
+    tracemalloc.start()
+    try:
+        with open(os.devnull, "w") as null, redirect_stdout(null):
+            func(*copies)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results[name] = {
+        "items": items,
+        "seconds": elapsed,
+        "relative": elapsed / calibration,
+        "throughput": items / elapsed if elapsed else float("inf"),
+        "peak_memory": peak,
+    }
+    print(
+        f"{name:<24} {items:>10} items  {elapsed:8.3f}s  "
+        f"x{elapsed / calibration:>9.2f}  {peak / 1e6:>9.1f} MB"
+    )
+    return result
+
+
+def compare(results, baseline, size):
+    """
+    Stages slower, relative to the calibration loop, or hungrier than the
+    baseline beyond the tolerances.
+    """
+    regressions = []
+    for name, base in baseline.items():
+        if name not in results:
+            regressions.append(f"{size} holders {name}: stage missing")
+            continue
+        current = results[name]
+        if current["relative"] > base["relative"] * TIME_TOLERANCE:
+            regressions.append(
+                f"{size} holders {name}: x{current['relative']:,.2f} "
+                f"vs x{base['relative']:,.2f} baseline"
+            )
+        if current["peak_memory"] > base["peak_memory"] * MEMORY_TOLERANCE:
+            regressions.append(
+                f"{size} holders {name}: {current['peak_memory'] / 1e6:,.1f} MB "
+                f"vs {base['peak_memory'] / 1e6:,.1f} MB baseline"
+            )
+    return regressions
+
+
+class SyntheticContract:
+    """
+    The address and abi, all the stages and `Ledger` use of a contract.
+    """
+
+    balanceOf = "balanceOf"
+
+    def __init__(self, address, abi):
+        self.address = address
+        self.abi = abi
+
+    def __str__(self):
+        return self.address
+
+
+@contextmanager
+def offline_stages(snapshot, chain):
+    """
+    Answer the node-facing helpers of the pipeline from the synthetic chain,
+    so the stages run as in a snapshot, minus the time spent on RPC.
+    """
+    erc20 = json.load(open("interfaces/ERC20.json"))
+    with tempfile.TemporaryDirectory() as tmp:
+        patches = {
+            (snapshot, "spankbank"): SyntheticContract(
+                SPANKBANK, chain["spankbank_abi"]
+            ),
+            (snapshot, "spank"): SyntheticContract(SPANK, erc20),
+            (snapshot, "interface"): SimpleNamespace(
+                ERC20=lambda address: SyntheticContract(address, erc20)
+            ),
+            (snapshot, "batch_call"): lambda calls, block=None: [
+                chain["onchain"][address] for _, _, address in calls
+            ],
+            (snapshot, "code_sizes"): lambda addresses, block=None: {
+                address: CODE_SIZE if address in chain["contracts"] else 0
+                for address in addresses
+            },
+            (snapshot, "find_pairs"): lambda contracts, factory, block=None: [
+                address for address in contracts if address in chain["pools"]
+            ],
+            (snapshot, "calc_spankbank_periods"): lambda events: chain["periods"],
+            (snapshot, "MERKLE_TREE"): str(Path(tmp) / "merkle-tree.pickle"),
+            (ledger, "get_logs"): serve_logs(chain["logs"]),
+            (ledger, "LEDGERS_DIR"): str(Path(tmp) / "ledgers"),
+        }
+        saved = {key: getattr(*key) for key in patches}
+        try:
+            for (module, name), value in patches.items():
+                setattr(module, name, value)
+            yield tmp
+        finally:
+            for (module, name), value in saved.items():
+                setattr(module, name, value)
+
+
+def fresh_ledgers(func):
+    """
+    Run a stage without the ledgers its previous run saved.
+    """
+
+    @wraps(func)
+    def run(*args):
+        shutil.rmtree(ledger.LEDGERS_DIR, ignore_errors=True)
+        return func(*args)
+
+    return run
+
+
+def serve_logs(logs):
+    """
+    Stand-in for `get_logs` over {address: logs sorted by block}.
+    """
+    blocks = {
+        address: [log["blockNumber"] for log in logs[address]] for address in logs
+    }
+
+    def get_logs(params, start, end, checkpoint=None, **kwargs):
+        addresses = params["address"]
+        addresses = [addresses] if isinstance(addresses, str) else addresses
+        found = []
+        for address in addresses:
+            lo = bisect_left(blocks[address], start)
+            hi = bisect_right(blocks[address], end)
+            found.extend(logs[address][lo:hi])
+        if len(addresses) > 1:
+            found.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+        return found
+
+    return get_logs
+
+
+def synthetic_chain(size, snapshot, seed=0):
+    """
+    Everything the stages read from the node, for `size` SPANK holders: the
+    Transfer logs of SPANK and of the LP tokens of the largest holders, which
+    holders have code, SpankBank logs and period end blocks, and the balances
+    `calc_spank` checks against.
+    """
+    rng = random.Random(seed)
+    holders = synthetic_holders(size, seed)
+    pools = sorted(holders, key=holders.get, reverse=True)[: max(size // 1000, 1)]
+    contracts = set(pools) | set(rng.sample(list(holders), size // CONTRACT_SHARE))
+    holders[SPANK_DEPLOYER] = 10 ** 27
+    holders[SPANKBANK] = 10 ** 26
+
+    transfers = synthetic_transfers(
+        holders, start=snapshot.spank_deploy, end=snapshot.uni_deploy, seed=seed
+    )
+    logs = {SPANK: transfer_logs(SPANK, transfers)}
+    users = list(holders)
+    for pool in pools:
+        mints = synthetic_transfers(
+            {user: rng.getrandbits(64) for user in rng.sample(users, min(LPS, size))},
+            start=snapshot.uniswap_v2_deploy,
+            end=snapshot.uni_deploy,
+            seed=rng.random(),
+        )
+        logs[pool] = transfer_logs(pool, mints)
+
+    balances = Counter()
+    for transfer in transfers:
+        apply_transfer(balances, *transfer)
+    staking_logs, periods, _ = synthetic_staking(max(size // 10, 1), seed=seed)
+    return {
+        "logs": logs,
+        "pools": set(pools),
+        "contracts": contracts,
+        "onchain": {
+            SPANK_DEPLOYER: balances[SPANK_DEPLOYER] + 10 ** 27,
+            SPANKBANK: balances[SPANKBANK],
+        },
+        "staking_logs": staking_logs,
+        "periods": periods,
+        "spankbank_abi": json.load(open("interfaces/SpankBank.json")),
+    }
+
+
+def synthetic_address(rng):
+    return to_checksum_address(f"0x{rng.getrandbits(160):040x}")
+
+
+def synthetic_holders(size, seed=0):
+    """
+    {holder: balance} with a long-tailed balance distribution.
+    """
+    rng = random.Random(seed)
+    return {
+        synthetic_address(rng): int(rng.paretovariate(1.2) * 10 ** 18)
+        for _ in range(size)
+    }
+
+
+def synthetic_transfers(
+    holders, per_holder=2, start=0, end=PERIODS * PERIOD_BLOCKS, seed=0
+):
+    """
+    Sorted (block, src, dst, wad) transfers in [start, end) that mint every
+    balance in `holders` and then move small amounts between holders.
+    """
+    rng = random.Random(seed)
+    users = list(holders)
+    transfers = [
+        (rng.randrange(start, end), ZERO_ADDRESS, user, balance)
+        for user, balance in holders.items()
+    ]
+    for _ in range(len(users) * (per_holder - 1)):
+        transfers.append(
+            (
+                rng.randrange(start, end),
+                rng.choice(users),
+                rng.choice(users),
+                rng.getrandbits(40),
+            )
+        )
+    return sorted(transfers, key=lambda transfer: transfer[0])
+
+
+def synthetic_staking(stakers, periods=PERIODS, seed=0):
+    """
+    Raw SpankBank logs for `stakers` stakers: a stake each, check-ins in later
+    periods and some splits and withdrawals. Also returns the period end
+    blocks and the points per period, as `calc_spankbank_points` finds them.
+    """
+    rng = random.Random(seed)
+    logs = []
+    points = {}
+
+    def log(name, period, *words):
+        block = period * PERIOD_BLOCKS + rng.randrange(PERIOD_BLOCKS)
+        logs.append(spank_log(name, block, words))
+
+    for _ in range(stakers):
+        staker = synthetic_address(rng)
+        start = rng.randrange(1, periods)
+        length = rng.randint(1, 12)
+        amount = rng.getrandbits(72)
+        log("StakeEvent", start, staker, start, amount, amount, length, staker, staker)
+        end = start + length - 1
+        for period in range(start + 1, min(start + length, periods)):
+            if rng.random() < 0.6:
+                end = max(end, period + rng.randint(0, 3))
+                points.setdefault(period, {})[staker] = amount * length
+                log("CheckInEvent", period, staker, period, amount * length, end)
+        roll = rng.random()
+        if roll < 0.05:
+            other = synthetic_address(rng)
+            log("SplitStakeEvent", end + 1, staker, other, other, other, amount // 2)
+        elif roll < 0.1:
+            log("WithdrawStakeEvent", end + 1, staker, amount)
+    ends = {
+        period: {
+            "end_block": (period + 1) * PERIOD_BLOCKS - 1,
+            "end_time": 1_500_000_000 + period * 86400,
+        }
+        for period in range(1, periods)
+    }
+    logs.sort(key=lambda log: log["blockNumber"])
+    for n, log in enumerate(logs):
+        log["logIndex"] = n
+    return logs, ends, points
+
+
+SPANK_EVENTS = {}
+TRANSFER_TOPIC = HexBytes(
+    event_abi_to_log_topic(
+        {
+            "type": "event",
+            "name": "Transfer",
+            "inputs": [{"type": "address"}, {"type": "address"}, {"type": "uint256"}],
+        }
+    )
+)
+
+
+def spank_log(name, block, words):
+    if not SPANK_EVENTS:
+        abi = json.load(open("interfaces/SpankBank.json"))
+        for item in abi:
+            if item["type"] == "event":
+                SPANK_EVENTS[item["name"]] = HexBytes(event_abi_to_log_topic(item))
+    data = b"".join(
+        (
+            bytes.fromhex(word[2:]).rjust(32, b"\0")
+            if isinstance(word, str)
+            else word.to_bytes(32, "big")
+        )
+        for word in words
+    )
+    return {
+        "address": "0x" + "aa" * 20,
+        "topics": [SPANK_EVENTS[name]],
+        "data": encode_hex(data),
+        "blockNumber": block,
+        "transactionHash": ZERO_HASH,
+        "transactionIndex": 0,
+        "blockHash": ZERO_HASH,
+        "logIndex": 0,
+    }
+
+
+def transfer_logs(token, transfers):
+    """
+    Raw Transfer logs of `token` for sorted (block, src, dst, wad) transfers.
+    """
+    return [
+        {
+            "address": token,
+            "topics": [
+                TRANSFER_TOPIC,
+                HexBytes(bytes.fromhex(src[2:]).rjust(32, b"\0")),
+                HexBytes(bytes.fromhex(dst[2:]).rjust(32, b"\0")),
+            ],
+            "data": encode_hex(wad.to_bytes(32, "big")),
+            "blockNumber": block,
+            "transactionHash": ZERO_HASH,
+            "transactionIndex": 0,
+            "blockHash": ZERO_HASH,
+            "logIndex": n,
+        }
+        for n, (block, src, dst, wad) in enumerate(transfers)
+    ]
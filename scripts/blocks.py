@@ -0,0 +1,112 @@
+import json
+import os
+from bisect import bisect_left, insort
+from pathlib import Path
+
+from scripts.profiling import count_cache_hit
+from scripts.rpc import get_eth
+
+BLOCK_TIMES = "snapshot/checkpoints/block-times.json"
+HEAD_OFFSET = 30  # fix for "block not found" near the chain head
+PATIENCE = 4  # guesses that may fail to halve the bounds before bisecting
+
+
+class BlockTimes:
+    """
+    Block timestamps, fetched once and kept on disk.
+    Timestamps of past blocks never change, so any block seen before is free.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or BLOCK_TIMES)
+        times = json.load(self.path.open()) if self.path.exists() else {}
+        self.times = {int(block): ts for block, ts in times.items()}
+        self.blocks = sorted(self.times)
+        self.fetched = 0
+
+    def __getitem__(self, block):
+        if block not in self.times:
+            self.times[block] = get_eth().getBlock(block).timestamp
+            insort(self.blocks, block)
+            self.fetched += 1
+        else:
+            count_cache_hit("block_times")
+        return self.times[block]
+
+    def bounds(self, ts, lo, hi):
+        """
+        Narrow `lo < block <= hi` using the cached blocks around `ts`.
+        """
+        i = bisect_left(self.blocks, lo)
+        j = bisect_left(self.blocks, hi)
+        known = self.blocks[i:j]
+        # NOTE: timestamps are strictly increasing, so cached blocks are sorted by time too
+        k = bisect_left([self.times[block] for block in known], ts)
+        if k > 0:
+            lo = max(lo, known[k - 1])
+        if k < len(known):
+            hi = min(hi, known[k])
+        return lo, hi
+
+    def save(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        json.dump(self.times, self.path.open("wt"))
+
+
+def block_at(ts, times=None):
+    """
+    First block with a timestamp at or after `ts`.
+    """
+    return blocks_at([ts], times)[0]
+
+
+def blocks_at(timestamps, times=None):
+    """
+    First block at or after each of `timestamps`.
+
+    Searches start from the genesis and head blocks, so the first guess is
+    seeded by the average block time. Timestamps are resolved in sorted order,
+    so every search starts from the bounds left by the previous one and from
+    the cached blocks.
+    """
+    times = times or BlockTimes()
+    head = get_eth().blockNumber - HEAD_OFFSET
+    result = {}
+    lo = 0
+    for ts in sorted(set(timestamps)):
+        result[ts] = search(ts, times, lo, head)
+        lo = max(result[ts] - 1, 0)
+    times.save()
+    return [result[ts] for ts in timestamps]
+
+
+def search(ts, times, lo, hi):
+    """
+    First block in `lo..hi` with a timestamp at or after `ts`.
+
+    The first guess interpolates between the bounds, later ones extrapolate
+    the block time measured between the last two probes. If guesses stop
+    halving the bounds the search falls back to bisection until they do.
+    """
+    if ts <= times[lo]:
+        return lo
+    if ts > times[hi]:
+        raise ValueError(f"timestamp {ts} is after block {hi}")
+    # invariant: times[lo] < ts <= times[hi]
+    lo, hi = times.bounds(ts, lo, hi)
+    a, b = lo, hi
+    stale = 0
+    while hi - lo > 1:
+        span = hi - lo
+        if stale < PATIENCE and times[a] != times[b]:
+            guess = b + (ts - times[b]) * (b - a) // (times[b] - times[a])
+        else:
+            guess = lo + span // 2
+        guess = min(max(guess, lo + 1), hi - 1)
+        if times[guess] < ts:
+            lo = guess
+        else:
+            hi = guess
+        a, b = b, guess
+        stale = stale + 1 if hi - lo > span // 2 else 0
+    return hi
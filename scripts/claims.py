@@ -0,0 +1,177 @@
+import json
+import os
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+from eth_utils import (
+    encode_hex,
+    is_checksum_address,
+    is_checksum_formatted_address,
+    is_hex_address,
+    to_checksum_address,
+)
+
+CLAIMS_DIR = "snapshot/claims"
+DISTRIBUTION = "snapshot/10-merkle-distribution.json"
+MANIFEST = "manifest.json"
+SHARD_SIZE = 256  # target claims per shard, 1M recipients => 4096 shards
+CLAIM_BATCH = 50  # claims per claimMany transaction
+
+
+def shard_key(account, prefix_length):
+    return account[2 : 2 + prefix_length].lower()
+
+
+def prefix_length_for(count, shard_size=SHARD_SIZE):
+    """
+    Shortest hex prefix that keeps shards around `shard_size` claims.
+    """
+    length = 1
+    while count / 16 ** length > shard_size:
+        length += 1
+    return length
+
+
+def write_claims(distribution, path=CLAIMS_DIR, prefix_length=None):
+    """
+    Write claims sharded by address prefix, plus a manifest with the root and total.
+    """
+    path = Path(path)
+    prefix_length = prefix_length or prefix_length_for(len(distribution["claims"]))
+    shards = defaultdict(dict)
+    for user, claim in distribution["claims"].items():
+        shards[shard_key(user, prefix_length)][user] = claim
+
+    os.makedirs(path, exist_ok=True)
+    for stale in path.glob("*.json"):
+        stale.unlink()
+    for key, claims in shards.items():
+        json.dump(claims, (path / f"{key}.json").open("wt"))
+
+    manifest = {
+        "merkleRoot": distribution["merkleRoot"],
+        "tokenTotal": distribution["tokenTotal"],
+        "claimCount": len(distribution["claims"]),
+        "prefixLength": prefix_length,
+        "shards": len(shards),
+    }
+    # NOTE: manifest goes last so a partial write is never mistaken for a complete one
+    json.dump(manifest, (path / MANIFEST).open("wt"), indent=2)
+    print(f"write {len(shards)} claim shards to {path}")
+    return manifest
+
+
+def load_manifest(path=CLAIMS_DIR):
+    return json.load((Path(path) / MANIFEST).open())
+
+
+def load_claim(account, path=CLAIMS_DIR, manifest=None):
+    """
+    Look up a single claim, reading only the shard it lives in.
+    Returns None if the account is not in the distribution, and raises
+    ValueError if it is not an address or has a wrong checksum.
+    """
+    # NOTE: mixed case means a checksum, which eth_utils.is_address no longer checks
+    if not is_hex_address(account) or (
+        is_checksum_formatted_address(account) and not is_checksum_address(account)
+    ):
+        raise ValueError(f"{account} is not a valid address")
+    account = to_checksum_address(account)
+    manifest = manifest or load_manifest(path)
+    shard = Path(path) / f"{shard_key(account, manifest['prefixLength'])}.json"
+    if not shard.exists():
+        return None
+    return json.load(shard.open()).get(account)
+
+
+def claim_batches(claims, claimed=(), batch_size=CLAIM_BATCH):
+    """
+    Batches of `(index, account, amount, proof)` for every claim whose index is
+    not in `claimed`, sorted by index so each batch writes as few bitmap words
+    as possible.
+    """
+    pending = sorted(
+        (claim["index"], user, int(claim["amount"], 16), claim["proof"])
+        for user, claim in claims.items()
+        if claim["index"] not in claimed
+    )
+    return [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+
+
+def claim_many_args(batch):
+    """
+    `claimMany` arguments for a batch: indices, accounts, amounts, the proofs
+    laid end to end and the length of each.
+    """
+    indices, accounts, amounts, proofs = zip(*batch) if batch else [()] * 4
+    nodes = [node for proof in proofs for node in proof]
+    lengths = [len(proof) for proof in proofs]
+    return list(indices), list(accounts), list(amounts), nodes, lengths
+
+
+class ClaimsTable:
+    """
+    Claims of a distribution ordered by index, in flat buffers: 20 bytes per
+    account, 32 per amount and per proof node, with each proof's span of nodes
+    in `offsets`. Claims are looked up by index without sorting or hashing.
+    """
+
+    def __init__(self, root, total, accounts, amounts, nodes, offsets):
+        self.root = root
+        self.total = total
+        self.accounts = accounts
+        self.amounts = amounts
+        self.nodes = nodes
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, path=DISTRIBUTION):
+        return cls.from_distribution(json.load(open(path)))
+
+    @classmethod
+    def from_distribution(cls, distribution):
+        claims = sorted(
+            distribution["claims"].items(), key=lambda item: item[1]["index"]
+        )
+        assert [claim["index"] for _, claim in claims] == list(
+            range(len(claims))
+        ), "claim indices are not 0..n-1"
+        accounts = bytearray()
+        amounts = bytearray()
+        nodes = bytearray()
+        offsets = array("I", [0])
+        for account, claim in claims:
+            accounts += bytes.fromhex(account[2:])
+            amounts += int(claim["amount"], 16).to_bytes(32, "big")
+            for node in claim["proof"]:
+                nodes += bytes.fromhex(node[2:])
+            offsets.append(len(nodes) // 32)
+        return cls(
+            distribution["merkleRoot"],
+            int(distribution["tokenTotal"], 16),
+            bytes(accounts),
+            bytes(amounts),
+            bytes(nodes),
+            offsets,
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        `(index, account, amount, proof)`, the arguments of `claim`.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        account = to_checksum_address(self.accounts[index * 20 : index * 20 + 20])
+        amount = int.from_bytes(self.amounts[index * 32 : index * 32 + 32], "big")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        proof = [
+            encode_hex(self.nodes[i * 32 : i * 32 + 32]) for i in range(start, end)
+        ]
+        return index, account, amount, proof
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
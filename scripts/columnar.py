@@ -0,0 +1,302 @@
+import heapq
+import json
+import mmap
+import os
+import shutil
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from pathlib import Path
+
+from eth_utils import encode_hex, to_checksum_address
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from scripts.decoder import is_word
+
+# NOTE: every row carries these, in the order web3 returns them
+META_COLUMNS = {
+    "blockNumber": "I",
+    "logIndex": "I",
+    "transactionIndex": "I",
+    "transactionHash": 32,
+    "blockHash": 32,
+    "address": 20,
+}
+
+
+def write_columns(rows, path, abi=None):
+    """
+    Store raw logs or decoded events as memory-mappable column files.
+    Rows are sorted by (blockNumber, logIndex) so block ranges can be bisected.
+
+    Decoded events need the `abi` they were decoded with, which gives the type
+    of every argument column.
+    """
+    path = Path(path)
+    rows = sorted(rows, key=lambda row: (row["blockNumber"], row["logIndex"]))
+    if path.exists():
+        shutil.rmtree(path)
+    os.makedirs(path)
+    if rows and "event" in rows[0]:
+        assert abi, "decoded events need their abi for the column types"
+        schemas = event_types(abi)
+        tables = {}
+        for row in rows:
+            tables.setdefault(row["event"], []).append(row)
+        meta = {"kind": "events", "tables": {}}
+        for name, events in tables.items():
+            types = schemas[name]
+            write_table(path / name, events, types)
+            meta["tables"][name] = {"count": len(events), "args": types}
+    else:
+        write_table(path / "logs", rows, {})
+        meta = {"kind": "logs", "tables": {"logs": {"count": len(rows)}}}
+    json.dump(meta, (path / "meta.json").open("wt"), indent=2)
+
+
+def load_columns(path):
+    path = Path(path)
+    meta = json.load((path / "meta.json").open())
+    if meta["kind"] == "logs":
+        return LogTable(path / "logs", meta["tables"]["logs"]["count"])
+    return EventStore(
+        {
+            name: EventTable(path / name, name, info["count"], info["args"])
+            for name, info in meta["tables"].items()
+        }
+    )
+
+
+def event_types(abi):
+    """
+    {event: {arg: abi type}}, with indexed dynamic values as the bytes32 topic
+    the decoder leaves them as.
+    """
+    return {
+        item["name"]: {
+            i["name"]: (
+                "bytes32" if i["indexed"] and not is_word(i["type"]) else i["type"]
+            )
+            for i in item["inputs"]
+        }
+        for item in abi
+        if item["type"] == "event"
+    }
+
+
+def write_table(path, rows, types):
+    os.makedirs(path)
+    for column, kind in META_COLUMNS.items():
+        write_column(path / column, [row[column] for row in rows], kind)
+    if not types:
+        write_column(path / "topicCount", [len(row["topics"]) for row in rows], "B")
+        topics = [
+            list(row["topics"]) + [b""] * (4 - len(row["topics"])) for row in rows
+        ]
+        for i in range(4):
+            write_column(path / f"topic{i}", [row[i] for row in topics], 32)
+        write_column(path / "data", [row["data"] for row in rows], "bytes")
+    for arg, kind in types.items():
+        values = [row["args"][arg] for row in rows]
+        write_column(path / f"arg.{arg}", values, column_kind(kind))
+
+
+def column_kind(abi_type):
+    if abi_type == "bool":
+        return "B"
+    if abi_type == "address":
+        return 20
+    if abi_type.startswith("uint"):
+        return "uint"
+    if abi_type.startswith("int"):
+        return "int"
+    if abi_type == "string":
+        return "string"
+    if abi_type.startswith("bytes") and abi_type != "bytes":
+        # NOTE: bytes1..bytes32 are fixed width
+        return int(abi_type[5:])
+    return "bytes"
+
+
+def write_column(path, values, kind):
+    """
+    Fixed-width columns hold one packed value per row, variable-width ones a
+    blob plus an array of row offsets.
+    """
+    with open(path, "wb") as fp:
+        if kind in {"I", "B"}:
+            array(kind, values).tofile(fp)
+        elif kind in {"uint", "int"}:
+            for value in values:
+                fp.write(value.to_bytes(32, "big", signed=kind == "int"))
+        elif isinstance(kind, int):
+            for value in values:
+                fp.write(HexBytes(value).rjust(kind, b"\x00") if value else bytes(kind))
+        else:
+            offsets = array("Q", [0])
+            for value in values:
+                value = value.encode() if kind == "string" else bytes(HexBytes(value))
+                fp.write(value)
+                offsets.append(offsets[-1] + len(value))
+            with open(f"{path}.offsets", "wb") as out:
+                offsets.tofile(out)
+
+
+def map_file(path):
+    with open(path, "rb") as fp:
+        if not os.fstat(fp.fileno()).st_size:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+@lru_cache(maxsize=None)
+def checksum(address):
+    return to_checksum_address(address)
+
+
+class Column:
+    """
+    Memory-mapped column, values are only decoded when a row is read.
+    """
+
+    def __init__(self, path, kind):
+        self.kind = kind
+        self.view = map_file(path)
+        if kind in {"I", "B"}:
+            self.view = self.view.cast(kind)
+        elif not isinstance(kind, int) and kind not in {"uint", "int"}:
+            self.offsets = map_file(f"{path}.offsets").cast("Q")
+
+    def __getitem__(self, i):
+        kind = self.kind
+        if kind in {"I", "B"}:
+            return self.view[i]
+        if kind in {"uint", "int"}:
+            return int.from_bytes(
+                self.view[i * 32 : i * 32 + 32], "big", signed=kind == "int"
+            )
+        if isinstance(kind, int):
+            return bytes(self.view[i * kind : i * kind + kind])
+        value = bytes(self.view[self.offsets[i] : self.offsets[i + 1]])
+        return value.decode() if kind == "string" else value
+
+
+class Table:
+    """
+    Rows `start` to `stop` of a column directory, sorted by block.
+    """
+
+    def __init__(self, path, count, start=0, stop=None):
+        self.path = Path(path)
+        self.count = count
+        self.start = start
+        self.stop = count if stop is None else stop
+        self.columns = {}
+
+    def column(self, name, kind):
+        if name not in self.columns:
+            self.columns[name] = Column(self.path / name, kind)
+        return self.columns[name]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.row(i)
+
+    def __getitem__(self, i):
+        return self.row(range(self.start, self.stop)[i])
+
+    def between(self, start, end):
+        """
+        Rows with `start <= blockNumber <= end`, without reading other rows.
+        """
+        blocks = self.column("blockNumber", "I").view
+        lo = bisect_left(blocks, start, self.start, self.stop)
+        hi = bisect_right(blocks, end, self.start, self.stop)
+        return self.view(lo, hi)
+
+    def keys(self):
+        blocks = self.column("blockNumber", "I")
+        indices = self.column("logIndex", "I")
+        for i in range(self.start, self.stop):
+            yield (blocks[i], indices[i]), i, self
+
+    def meta(self, i):
+        return {
+            "logIndex": self.column("logIndex", "I")[i],
+            "transactionIndex": self.column("transactionIndex", "I")[i],
+            "transactionHash": HexBytes(self.column("transactionHash", 32)[i]),
+            "address": checksum(self.column("address", 20)[i]),
+            "blockHash": HexBytes(self.column("blockHash", 32)[i]),
+            "blockNumber": self.column("blockNumber", "I")[i],
+        }
+
+
+class LogTable(Table):
+    def view(self, start, stop):
+        return LogTable(self.path, self.count, start, stop)
+
+    def row(self, i):
+        count = self.column("topicCount", "B")[i]
+        log = self.meta(i)
+        log["topics"] = [
+            HexBytes(self.column(f"topic{n}", 32)[i]) for n in range(count)
+        ]
+        log["data"] = encode_hex(self.column("data", "bytes")[i])
+        log["removed"] = False
+        return AttributeDict(log)
+
+
+class EventTable(Table):
+    def __init__(self, path, name, count, args, start=0, stop=None):
+        super().__init__(path, count, start, stop)
+        self.name = name
+        self.args = args
+
+    def view(self, start, stop):
+        return EventTable(self.path, self.name, self.count, self.args, start, stop)
+
+    def row(self, i):
+        args = {}
+        for arg, abi_type in self.args.items():
+            value = self.column(f"arg.{arg}", column_kind(abi_type))[i]
+            if abi_type == "address":
+                value = checksum(value)
+            elif abi_type == "bool":
+                value = bool(value)
+            args[arg] = value
+        return AttributeDict(
+            {"args": AttributeDict(args), "event": self.name, **self.meta(i)}
+        )
+
+
+class EventStore:
+    """
+    Decoded events split into one table per event name.
+    Iterating yields every event in (blockNumber, logIndex) order.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+    def __iter__(self):
+        streams = [table.keys() for table in self.tables.values()]
+        for _, i, table in heapq.merge(*streams, key=lambda item: item[0]):
+            yield table.row(i)
+
+    def groupby(self):
+        """
+        Like `toolz.groupby("event", events)`, without decoding any rows.
+        """
+        return dict(self.tables)
+
+    def between(self, start, end):
+        return EventStore(
+            {name: table.between(start, end) for name, table in self.tables.items()}
+        )
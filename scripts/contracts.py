@@ -0,0 +1,55 @@
+import json
+import os
+from pathlib import Path
+
+from brownie import interface
+from tqdm import tqdm
+
+from scripts.multicall import batch_call
+from scripts.profiling import count_cache_hit
+from scripts.rpc import request_batch
+
+CODE_CACHE = "snapshot/checkpoints/code-{block}.json"
+CHECKPOINT_SIZE = 10000  # addresses fetched between cache writes
+
+
+def code_sizes(addresses, block=None):
+    """
+    Code size of each address at `block`, latest by default, fetched with
+    concurrent JSON-RPC batches.
+
+    Code at a past block never changes, so sizes at a given block are cached
+    per address on disk and only unseen addresses are requested.
+    """
+    path = Path(CODE_CACHE.format(block=block))
+    cache = json.load(path.open()) if block is not None and path.exists() else {}
+    missing = [address for address in addresses if address not in cache]
+    count_cache_hit("code", len(addresses) - len(missing))
+    tag = "latest" if block is None else hex(block)
+    for i in tqdm(range(0, len(missing), CHECKPOINT_SIZE)):
+        batch = missing[i : i + CHECKPOINT_SIZE]
+        codes = request_batch([("eth_getCode", [address, tag]) for address in batch])
+        for address, code in zip(batch, codes):
+            cache[address] = (len(code) - 2) // 2
+        if block is not None:
+            os.makedirs(path.parent, exist_ok=True)
+            json.dump(cache, path.open("wt"))
+    return {address: cache[address] for address in addresses}
+
+
+def find_pairs(contracts, factory, block=None):
+    """
+    Contracts whose `factory()` returns `factory`, resolved in one batched pass.
+    Contracts without the method, or reverting, are skipped.
+    """
+    contracts = list(contracts)
+    if not contracts:
+        return []
+    method = interface.UniswapPair(contracts[0]).factory
+    results = batch_call([(address, method) for address in contracts], block)
+    pairs = [
+        address for address, result in zip(contracts, results) if result == factory
+    ]
+    for address in pairs:
+        print(f"{address} is a uniswap pool")
+    return pairs
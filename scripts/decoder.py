@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+try:
+    from eth_abi import decode_abi
+except ImportError:
+    # NOTE: eth-abi 4 renamed decode_abi
+    from eth_abi import decode as decode_abi
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+STATIC_WORDS = {"address", "bool", "bytes32"}
+
+
+class EventDecoder:
+    """
+    One precompiled decoder per topic0, producing the same events as
+    `contract.events[name]().processLog(log)` without rebuilding them per log.
+    """
+
+    def __init__(self, abi):
+        self.events = {}
+        for item in abi:
+            if item["type"] != "event" or item.get("anonymous"):
+                continue
+            indexed = [i for i in item["inputs"] if i["indexed"]]
+            data = [i for i in item["inputs"] if not i["indexed"]]
+            self.events[HexBytes(event_abi_to_log_topic(item))] = {
+                "name": item["name"],
+                "order": [i["name"] for i in item["inputs"]],
+                "indexed": [(i["name"], i["type"]) for i in indexed],
+                "data": [(i["name"], i["type"]) for i in data],
+                "static": all(is_word(i["type"]) for i in data),
+            }
+
+    def decode(self, log):
+        event = self.events[HexBytes(log["topics"][0])]
+        args = {}
+        for (name, abi_type), topic in zip(event["indexed"], log["topics"][1:]):
+            # NOTE: dynamic indexed values are only available as their hash
+            topic = bytes(topic)
+            args[name] = decode_word(abi_type, topic) if is_word(abi_type) else topic
+        data = bytes(HexBytes(log["data"]))
+        if event["static"]:
+            for n, (name, abi_type) in enumerate(event["data"]):
+                args[name] = decode_word(abi_type, data[n * 32 : n * 32 + 32])
+        else:
+            types = [abi_type for _, abi_type in event["data"]]
+            for (name, abi_type), value in zip(event["data"], decode_abi(types, data)):
+                args[name] = normalize(abi_type, value)
+        return AttributeDict(
+            {
+                "args": AttributeDict({name: args[name] for name in event["order"]}),
+                "event": event["name"],
+                "logIndex": log["logIndex"],
+                "transactionIndex": log["transactionIndex"],
+                "transactionHash": log["transactionHash"],
+                "address": log["address"],
+                "blockHash": log["blockHash"],
+                "blockNumber": log["blockNumber"],
+            }
+        )
+
+    def decode_all(self, logs):
+        return [self.decode(log) for log in logs]
+
+
+def is_word(abi_type):
+    return abi_type in STATIC_WORDS or abi_type.startswith(("uint", "int"))
+
+
+def decode_word(abi_type, word):
+    if abi_type.startswith("uint"):
+        return int.from_bytes(word, "big")
+    if abi_type.startswith("int"):
+        return int.from_bytes(word, "big", signed=True)
+    if abi_type == "address":
+        return checksum(word[12:])
+    if abi_type == "bool":
+        return word != bytes(32)
+    return word
+
+
+def normalize(abi_type, value):
+    # NOTE: web3 returns checksummed addresses
+    if abi_type == "address":
+        return checksum(value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def checksum(address):
+    return to_checksum_address(address)
@@ -0,0 +1,199 @@
+import json
+import os
+from collections import Counter
+from hashlib import sha1
+from pathlib import Path
+
+from brownie import web3
+from eth_utils import encode_hex, event_abi_to_log_topic
+from toolz import valfilter
+
+from scripts.decoder import EventDecoder
+from scripts.logs import get_logs
+
+LEDGERS_DIR = "snapshot/ledgers"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+class Ledger:
+    """
+    ERC20 balances of one token as of `block`, persisted per token and block
+    so a later snapshot only scans the Transfer logs since the last one.
+    """
+
+    def __init__(self, contract, deploy_block, block=None, balances=None):
+        self.contract = web3.eth.contract(str(contract), abi=contract.abi)
+        self.deploy_block = deploy_block
+        self.block = deploy_block - 1 if block is None else block
+        self.balances = Counter(balances or {})
+
+    @property
+    def path(self):
+        return Path(LEDGERS_DIR) / self.contract.address / f"{self.block}.json"
+
+    @classmethod
+    def load(cls, contract, deploy_block, block):
+        """
+        Latest persisted ledger at or before `block`, or an empty one at deploy.
+        """
+        path = Path(LEDGERS_DIR) / str(contract)
+        saved = sorted(int(item.stem) for item in path.glob("*.json"))
+        saved = [x for x in saved if x <= block]
+        if not saved:
+            return cls(contract, deploy_block)
+        data = json.load((path / f"{saved[-1]}.json").open())
+        assert data["deploy_block"] == deploy_block, "ledger from another deploy block"
+        return cls(contract, deploy_block, data["block"], data["balances"])
+
+    def advance(self, block):
+        """
+        Apply Transfer logs in (self.block, block] and persist the result.
+        """
+        assert block >= self.block, "ledger can only move forward"
+        if block == self.block:
+            return self
+        for transfer in self.transfers(block):
+            apply_transfer(self.balances, *transfer)
+        self.block = block
+        self.save()
+        return self
+
+    def history(self, blocks):
+        """
+        Balances at each of the sorted `blocks` from a single pass over the logs.
+        The ledger ends up at the last block.
+        """
+        assert blocks == sorted(set(blocks)), "blocks must be sorted and unique"
+        assert blocks[0] >= self.block, "ledger can only move forward"
+        history = replay_transfers(self.balances, self.transfers(blocks[-1]), blocks)
+        self.block = blocks[-1]
+        self.save()
+        return history
+
+    def transfers(self, block):
+        """
+        (block, src, dst, wad) for every Transfer in (self.block, block].
+        """
+        transfer = self.contract.events.Transfer()
+        logs = get_logs(
+            transfer_filter(transfer, self.contract.address),
+            self.block + 1,
+            block,
+            checkpoint=f"transfers-{self.contract.address}",
+        )
+        decoder = EventDecoder(self.contract.abi)
+        for log in logs:
+            log = decoder.decode(log)
+            yield log.blockNumber, log.args.src, log.args.dst, log.args.wad
+
+    def save(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        data = {
+            "token": self.contract.address,
+            "deploy_block": self.deploy_block,
+            "block": self.block,
+            "balances": valfilter(bool, dict(self.balances)),
+        }
+        json.dump(data, self.path.open("wt"))
+        print("write ledger", self.path)
+
+
+def advance_ledgers(ledgers, block):
+    """
+    Move several token ledgers to `block` with one address-list Transfer scan.
+    Each log only applies to its token's ledger past that ledger's own block.
+    """
+    ledgers = {
+        ledger.contract.address: ledger for ledger in ledgers if ledger.block < block
+    }
+    if not ledgers:
+        return
+    addresses = sorted(ledgers)
+    transfer = ledgers[addresses[0]].contract.events.Transfer()
+    scan_id = sha1("".join(addresses).encode()).hexdigest()[:16]
+    logs = get_logs(
+        transfer_filter(transfer, addresses),
+        min(ledger.block for ledger in ledgers.values()) + 1,
+        block,
+        checkpoint=f"transfers-{scan_id}",
+    )
+    decoder = EventDecoder(ledgers[addresses[0]].contract.abi)
+    for log in logs:
+        ledger = ledgers[log["address"]]
+        if log["blockNumber"] <= ledger.block:
+            continue
+        log = decoder.decode(log)
+        apply_transfer(
+            ledger.balances, log.blockNumber, log.args.src, log.args.dst, log.args.wad
+        )
+    for ledger in ledgers.values():
+        ledger.block = block
+        ledger.save()
+
+
+def transfer_filter(transfer, address):
+    return {
+        "address": address,
+        "topics": [encode_hex(event_abi_to_log_topic(transfer.abi))],
+    }
+
+
+class BalanceHistory:
+    """
+    Balances at several blocks, stored as a base snapshot plus the balances
+    that changed in each window, so memory follows the number of changes.
+    """
+
+    def __init__(self, base, blocks, changes):
+        self.base = dict(base)
+        self.blocks = blocks
+        self.changes = changes
+
+    def __iter__(self):
+        """
+        Yield (block, balances) in order, reusing one dict between snapshots.
+        """
+        balances = valfilter(bool, self.base)
+        for block in self.blocks:
+            for user, balance in self.changes[block].items():
+                if balance:
+                    balances[user] = balance
+                else:
+                    balances.pop(user, None)
+            yield block, balances
+
+    def at(self, block):
+        for snapshot_block, balances in self:
+            if snapshot_block == block:
+                return dict(balances)
+        raise KeyError(block)
+
+
+def apply_transfer(balances, block, src, dst, wad):
+    if src != ZERO_ADDRESS:
+        balances[src] -= wad
+    if dst != ZERO_ADDRESS:
+        balances[dst] += wad
+
+
+def replay_transfers(balances, transfers, blocks):
+    """
+    Apply sorted (block, src, dst, wad) transfers to `balances` in place and
+    record which balances changed up to each of the sorted, unique `blocks`.
+    """
+    base = dict(balances)
+    changes = {}
+    changed = set()
+    pending = iter(blocks)
+    current = next(pending)
+    for transfer in transfers:
+        while transfer[0] > current:
+            changes[current] = {user: balances[user] for user in changed}
+            changed = set()
+            current = next(pending)
+        apply_transfer(balances, *transfer)
+        changed.update(user for user in transfer[1:3] if user != ZERO_ADDRESS)
+    changes[current] = {user: balances[user] for user in changed}
+    for block in pending:
+        changes[block] = {}
+    return BalanceHistory(base, blocks, changes)
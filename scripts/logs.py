@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import pickle
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from hashlib import sha1
+from pathlib import Path
+from time import sleep
+
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import Timeout
+from tqdm import tqdm
+
+from scripts.profiling import count_cache_hit
+from scripts.rpc import BACKOFF, RETRIES, get_eth
+
+CHECKPOINTS_DIR = "snapshot/checkpoints"
+WORKERS = 8
+MAX_STEP = 1_000_000
+TARGET_LOGS = 2000  # widen the range while responses stay below this
+# NOTE: node-specific wording for "range too large", matched case-insensitively
+RANGE_ERRORS = [
+    "more than",
+    "too many",
+    "limit exceeded",
+    "response size",
+    "block range",
+    "timeout",
+    "timed out",
+]
+# NOTE: a dropped or refused connection says nothing about the range, retry it as is
+CONNECTION_ERRORS = (RequestsConnectionError, ConnectionError)
+
+
+class Checkpoint:
+    """
+    Finished block ranges stored as one pickle per range, so an interrupted
+    scan only refetches the gaps. Ranges are kept apart per filter `params`, so
+    a changed address or topic never reuses logs fetched for another filter.
+    """
+
+    def __init__(self, name, params=None):
+        digest = sha1(json.dumps(params, sort_keys=True, default=str).encode())
+        self.path = Path(CHECKPOINTS_DIR) / f"{name}-{digest.hexdigest()[:16]}"
+
+    def ranges(self):
+        if not self.path.exists():
+            return []
+        return sorted(
+            tuple(int(x) for x in item.stem.split("-"))
+            for item in self.path.glob("*.pickle")
+        )
+
+    def save(self, start, end, logs):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.path / f"{start}-{end}.tmp"
+        pickle.dump(logs, tmp.open("wb"))
+        os.replace(tmp, self.path / f"{start}-{end}.pickle")
+
+    def load(self, start, end):
+        logs = []
+        for lo, hi in self.ranges():
+            if hi < start or lo > end:
+                continue
+            logs.extend(
+                log
+                for log in pickle.load((self.path / f"{lo}-{hi}.pickle").open("rb"))
+                if start <= log["blockNumber"] <= end
+            )
+        return logs
+
+    def gaps(self, start, end):
+        gaps = []
+        cursor = start
+        for lo, hi in self.ranges():
+            if hi < cursor or lo > end:
+                continue
+            if lo > cursor:
+                gaps.append((cursor, lo - 1))
+            cursor = max(cursor, hi + 1)
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+
+def is_range_error(exc):
+    if isinstance(exc, CONNECTION_ERRORS):
+        return False
+    if isinstance(exc, (Timeout, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, ValueError) and any(
+        hint in str(exc).lower() for hint in RANGE_ERRORS
+    )
+
+
+def get_logs(params, start, end, checkpoint=None, step=10000, workers=WORKERS):
+    """
+    Fetch logs matching `params` between `start` and `end` inclusive.
+
+    Ranges are requested concurrently on a bounded pool. A range the node refuses
+    is split in half, sparse regions get wider ranges, and every finished range is
+    checkpointed so a rerun picks up where the last one stopped. A range that
+    fails on the connection is retried with backoff, then the error is raised.
+    """
+    checkpoint = Checkpoint(checkpoint, params) if checkpoint else None
+    gaps = deque(checkpoint.gaps(start, end) if checkpoint else [(start, end)])
+    retries = deque()
+    found = []
+
+    def next_range():
+        if retries:
+            return retries.popleft()
+        lo, hi = gaps.popleft()
+        if lo + step - 1 < hi:
+            gaps.appendleft((lo + step, hi))
+            hi = lo + step - 1
+        return lo, hi
+
+    eth = get_eth()
+
+    def fetch(lo, hi):
+        for attempt in range(RETRIES + 1):
+            try:
+                return eth.getLogs(dict(params, fromBlock=lo, toBlock=hi))
+            except CONNECTION_ERRORS:
+                if attempt == RETRIES:
+                    raise
+                sleep(BACKOFF * 2 ** attempt)
+
+    total = sum(hi - lo + 1 for lo, hi in gaps)
+    count_cache_hit("log_blocks", end - start + 1 - total)
+    pending = {}
+    with ThreadPoolExecutor(workers) as pool, tqdm(total=total) as bar:
+        while gaps or retries or pending:
+            while len(pending) < workers and (gaps or retries):
+                lo, hi = next_range()
+                pending[pool.submit(fetch, lo, hi)] = (lo, hi)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                lo, hi = pending.pop(future)
+                try:
+                    logs = future.result()
+                except Exception as e:
+                    if not is_range_error(e) or lo == hi:
+                        raise
+                    mid = (lo + hi) // 2
+                    retries.extend([(lo, mid), (mid + 1, hi)])
+                    step = max(1, (hi - lo + 1) // 2)
+                    continue
+
+                if checkpoint:
+                    checkpoint.save(lo, hi, logs)
+                else:
+                    found.extend(logs)
+                if len(logs) < TARGET_LOGS // 2:
+                    step = min(step * 2, MAX_STEP)
+                bar.update(hi - lo + 1)
+
+    logs = checkpoint.load(start, end) if checkpoint else found
+    return sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
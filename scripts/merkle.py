@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_utils import decode_hex, encode_hex
+
+try:
+    # NOTE: pysha3 ships with brownie and is several times faster per call than eth_hash
+    from sha3 import keccak_256
+
+    def keccak(data):
+        return keccak_256(data).digest()
+
+except ImportError:
+    from eth_hash.auto import keccak
+
+PARALLEL_THRESHOLD = 2 ** 16  # nodes in a layer before a process pool pays off
+BATCH_SIZE = 2 ** 14  # nodes per worker task
+
+
+class MerkleTree:
+    def __init__(self, elements, workers=None):
+        workers = workers or os.cpu_count()
+        pool = None
+        if workers > 1 and len(elements) >= PARALLEL_THRESHOLD:
+            pool = ProcessPoolExecutor(workers)
+        try:
+            leaves = [decode_hex(el) for el in elements]
+            batches = [
+                leaves[i : i + BATCH_SIZE] for i in range(0, len(leaves), BATCH_SIZE)
+            ]
+            self.leaves = split_nodes(
+                run_batches(hash_leaves, batches, pool, len(leaves))
+            )
+            self.elements = sorted(set(self.leaves))
+            self.positions = {el: idx for idx, el in enumerate(self.elements)}
+            self.layers = build_layers(self.elements, pool)
+        finally:
+            if pool:
+                pool.shutdown()
+
+    @property
+    def root(self):
+        return self.layers[-1][0]
+
+    def get_proof(self, el):
+        el = keccak(decode_hex(el))
+        idx = self.positions[el]
+        proof = []
+        for layer in self.layers:
+            pair_idx = idx + 1 if idx % 2 == 0 else idx - 1
+            if pair_idx < len(layer):
+                proof.append(encode_hex(layer[pair_idx]))
+            idx //= 2
+        return proof
+
+    def get_all_proofs(self):
+        """
+        Proofs for every input element in the order they were passed in.
+
+        Walks each layer once, so the whole set costs O(n log n)
+        instead of a proof lookup per claimant.
+        """
+        proofs = [[] for _ in self.elements]
+        for depth, layer in enumerate(self.layers[:-1]):
+            siblings = [encode_hex(node) for node in layer]
+            for idx, proof in enumerate(proofs):
+                pair_idx = (idx >> depth) ^ 1
+                if pair_idx < len(layer):
+                    proof.append(siblings[pair_idx])
+        return [proofs[self.positions[leaf]] for leaf in self.leaves]
+
+    def update(self, replaced=None, added=()):
+        """
+        Replace elements in place and append new ones, rehashing only the
+        paths from those leaves to the root.
+
+        `replaced` maps previous elements to the ones taking over their slot,
+        so the first layer is no longer sorted and the tree differs from a fresh
+        build of the same elements, but every proof still verifies.
+        Returns the positions rehashed in each layer.
+        """
+        elements = self.layers[0]
+        inputs = {leaf: idx for idx, leaf in enumerate(self.leaves)}
+        dirty = set()
+        for old, new in (replaced or {}).items():
+            old, new = keccak(decode_hex(old)), keccak(decode_hex(new))
+            idx = self.positions.pop(old)
+            elements[idx] = new
+            self.positions[new] = idx
+            self.leaves[inputs[old]] = new
+            dirty.add(idx)
+        for el in added:
+            leaf = keccak(decode_hex(el))
+            self.positions[leaf] = len(elements)
+            dirty.add(len(elements))
+            elements.append(leaf)
+            self.leaves.append(leaf)
+
+        changed = [dirty]
+        depth = 0
+        while len(self.layers[depth]) > 1:
+            layer = self.layers[depth]
+            if depth + 1 == len(self.layers):
+                self.layers.append([])
+            parent = self.layers[depth + 1]
+            size = (len(layer) + 1) // 2
+            del parent[size:]
+            parent.extend([None] * (size - len(parent)))
+            dirty = {idx // 2 for idx in changed[depth]}
+            for idx in dirty:
+                a = layer[2 * idx]
+                b = layer[2 * idx + 1] if 2 * idx + 1 < len(layer) else None
+                parent[idx] = a if b is None else keccak(a + b if a < b else b + a)
+            changed.append(dirty)
+            depth += 1
+        del self.layers[depth + 1 :]
+        return changed
+
+    def changed_claims(self, changed):
+        """
+        Input positions whose leaf or proof includes a node rehashed by `update`.
+
+        Any changed leaf alters a node on every other path to the root, so
+        after a real update this is every claim.
+        """
+        stale = [False] * len(self.elements)
+        for depth, positions in enumerate(changed[:-1]):
+            for idx in positions:
+                # NOTE: the leaves under the sibling have this node in their proof
+                for span in [idx, idx ^ 1]:
+                    start = span << depth
+                    end = min((span + 1) << depth, len(stale))
+                    stale[start:end] = [True] * max(0, end - start)
+        return [
+            idx for idx, leaf in enumerate(self.leaves) if stale[self.positions[leaf]]
+        ]
+
+
+def build_layers(elements, pool=None):
+    """
+    Merkle layers over sorted-pair keccak, hashed in batches over contiguous buffers.
+
+    An odd node at the end of a layer is carried up unhashed.
+    """
+    layers = [elements]
+    buffer = b"".join(elements)
+    while len(layers[-1]) > 1:
+        layer = layers[-1]
+        paired = len(layer) // 2 * 64
+        step = BATCH_SIZE * 32
+        batches = [buffer[i : min(i + step, paired)] for i in range(0, paired, step)]
+        buffer = run_batches(hash_pairs, batches, pool, len(layer))
+        if len(layer) % 2:
+            buffer += layer[-1]
+        layers.append(split_nodes(buffer))
+    return layers
+
+
+def run_batches(func, batches, pool=None, size=0):
+    """
+    Apply a batch hasher, in a process pool once the layer is large enough.
+    """
+    if pool is None or size < PARALLEL_THRESHOLD:
+        return b"".join(map(func, batches))
+    return b"".join(pool.map(func, batches))
+
+
+def split_nodes(buffer):
+    return [buffer[i : i + 32] for i in range(0, len(buffer), 32)]
+
+
+def hash_leaves(leaves):
+    return b"".join(keccak(leaf) for leaf in leaves)
+
+
+def hash_pairs(buffer):
+    """
+    Sorted-pair keccak over a buffer of concatenated 32-byte node pairs.
+    """
+    view = memoryview(buffer)
+    out = []
+    for i in range(0, len(buffer), 64):
+        a = view[i : i + 32].tobytes()
+        b = view[i + 32 : i + 64].tobytes()
+        out.append(keccak(a + b if a < b else b + a))
+    return b"".join(out)
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from brownie import interface, web3
+from brownie.exceptions import VirtualMachineError
+
+MULTICALL_ADDRESS = "0xeefBa1e63905eF1D7ACbA5a8513c70307C1cE441"
+# NOTE: multicall only exists from this block, earlier blocks are read call by call
+MULTICALL_DEPLOY = 7929876
+GAS_LIMIT = 50_000_000  # eth_call gas cap on most nodes
+GAS_PER_CALL = 30_000
+MAX_RESPONSE = 1_000_000  # bytes of return data per aggregate
+MAX_CALLS = 1000
+WORKERS = 8
+# NOTE: eth_call errors a call can cause itself, everything else is the node's
+CALL_ERRORS = ["revert", "out of gas", "invalid opcode", "invalid jump", "stack"]
+
+
+@lru_cache()
+def get_multicall():
+    return interface.Multicall(MULTICALL_ADDRESS)
+
+
+def batch_call(calls, block=None, gas_per_call=GAS_PER_CALL, workers=WORKERS):
+    """
+    Results of `calls` at `block`, see `batch_call_blocks`.
+    """
+    return batch_call_blocks(calls, [block], gas_per_call, workers)[block]
+
+
+def batch_call_blocks(calls, blocks, gas_per_call=GAS_PER_CALL, workers=WORKERS):
+    """
+    Run `calls` at each of `blocks` through multicall.
+
+    Each call is a `(target, fn, *args)` tuple, where `fn` is a contract method
+    used to encode the input and decode the output. Calls are split into chunks
+    that fit the gas and response limits, and chunks of all blocks run on one pool.
+    Returns {block: results}, with None for calls that failed.
+    """
+    size = chunk_size(calls, gas_per_call)
+    chunks = [(block, i) for block in blocks for i in range(0, len(calls), size)]
+    with ThreadPoolExecutor(workers) as pool:
+        parts = pool.map(lambda x: aggregate(calls[x[1] : x[1] + size], x[0]), chunks)
+        results = {block: [] for block in blocks}
+        for (block, _), part in zip(chunks, parts):
+            results[block].extend(part)
+    return results
+
+
+def chunk_size(calls, gas_per_call=GAS_PER_CALL):
+    # NOTE: each result is abi-encoded as offset + length + static output words
+    response = max(32 * (len(fn.abi["outputs"]) + 2) for _, fn, *_ in calls)
+    return max(1, min(MAX_CALLS, GAS_LIMIT // gas_per_call, MAX_RESPONSE // response))
+
+
+def aggregate(calls, block=None):
+    """
+    Like tryAggregate: a chunk that reverts or runs out of gas is bisected until
+    the failing calls are isolated, and those return None instead of failing the
+    batch. Node and transport errors are raised.
+    """
+    if block is not None and block < MULTICALL_DEPLOY:
+        return [try_call(call, block) for call in calls]
+    encoded = [[str(target), fn.encode_input(*args)] for target, fn, *args in calls]
+    try:
+        _, results = get_multicall().aggregate.call(encoded, block_identifier=block)
+    except (ValueError, VirtualMachineError) as error:
+        if not is_call_error(error):
+            raise
+        if len(calls) == 1:
+            return [None]
+        mid = len(calls) // 2
+        return aggregate(calls[:mid], block) + aggregate(calls[mid:], block)
+    return [try_decode(fn, data) for (_, fn, *_), data in zip(calls, results)]
+
+
+def try_decode(fn, data):
+    # NOTE: a contract with a silent fallback succeeds with data that does not decode
+    try:
+        return fn.decode_output(data)
+    except Exception:
+        return None
+
+
+def try_call(call, block=None):
+    target, fn, *args = call
+    tx = {"to": str(target), "data": fn.encode_input(*args)}
+    try:
+        return try_decode(fn, web3.eth.call(tx, block or "latest"))
+    except (ValueError, VirtualMachineError) as error:
+        if not is_call_error(error):
+            raise
+        return None
+
+
+def is_call_error(error):
+    """
+    Whether an eth_call failed because of the calls, a revert or running out of
+    gas, rather than because of the node or the connection.
+    """
+    if isinstance(error, VirtualMachineError):
+        return True
+    # NOTE: web3 and the rpc client raise with the JSON-RPC error object
+    detail = error.args[0] if error.args else ""
+    message = detail.get("message", "") if isinstance(detail, dict) else str(detail)
+    return any(reason in message.lower() for reason in CALL_ERRORS)
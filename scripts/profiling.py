@@ -0,0 +1,251 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from brownie import web3
+from eth_utils import encode_hex
+from web3.providers.base import BaseProvider
+
+PROFILES_DIR = "snapshot/profiles"
+ACTIVE = None  # profile of the running pipeline, counters are no-ops without one
+
+
+class Profile:
+    """
+    Time, memory, RPC and cache counters for each stage of one run.
+
+    RPC calls made from worker threads count towards the innermost stage
+    running at the time. A stage's `peak_rss` is the most resident memory seen
+    while it ran, or None where the peak cannot be reset per stage.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.stages = {}
+        self.stack = []
+        self.peaks = []  # peak rss of each running stage so far
+        # NOTE: resetting the kernel's peak for a stage also resets ru_maxrss
+        self.max_rss = peak_rss()
+        self.lock = threading.Lock()
+
+    def current(self):
+        name = self.stack[-1] if self.stack else "other"
+        if name not in self.stages:
+            self.stages[name] = {
+                "calls": 0,
+                "wall": 0.0,
+                "cpu": 0.0,
+                "rpc": Counter(),
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "retries": 0,
+                "cache_hits": Counter(),
+                "peak_rss": 0,
+            }
+        return self.stages[name]
+
+    def count(self, key, amount=1, kind=None):
+        with self.lock:
+            stats = self.current()
+            if kind is None:
+                stats[key] += amount
+            else:
+                stats[key][kind] += amount
+
+    def report(self):
+        stages = {
+            name: dict(
+                stats, rpc=dict(stats["rpc"]), cache_hits=dict(stats["cache_hits"])
+            )
+            for name, stats in self.stages.items()
+        }
+        totals = {"rpc": Counter(), "cache_hits": Counter()}
+        for stats in self.stages.values():
+            totals["rpc"].update(stats["rpc"])
+            totals["cache_hits"].update(stats["cache_hits"])
+        return {
+            "name": self.name,
+            "started": self.started,
+            "wall": time.perf_counter() - self.wall,
+            "cpu": time.process_time() - self.cpu,
+            "peak_rss": max(self.max_rss, peak_rss(), recent_peak_rss() or 0),
+            "rpc": dict(totals["rpc"]),
+            "cache_hits": dict(totals["cache_hits"]),
+            "bytes_sent": sum(stats["bytes_sent"] for stats in self.stages.values()),
+            "bytes_received": sum(
+                stats["bytes_received"] for stats in self.stages.values()
+            ),
+            "retries": sum(stats["retries"] for stats in self.stages.values()),
+            "stages": stages,
+        }
+
+
+def peak_rss():
+    """
+    Peak resident memory of the process in bytes, over the whole run.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: linux reports kilobytes, macos bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def reset_peak_rss():
+    """
+    Restart the kernel's high-water mark of resident memory from the current
+    value, so `recent_peak_rss` covers only what runs next. Linux only.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def recent_peak_rss():
+    """
+    Peak resident memory in bytes since the last `reset_peak_rss`, None where
+    the kernel does not report it.
+    """
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def count_rpc(method, sent=0, received=0):
+    if ACTIVE:
+        ACTIVE.count("rpc", kind=method)
+        ACTIVE.count("bytes_sent", sent)
+        ACTIVE.count("bytes_received", received)
+
+
+def count_bytes(sent, received):
+    if ACTIVE:
+        ACTIVE.count("bytes_sent", sent)
+        ACTIVE.count("bytes_received", received)
+
+
+def count_retry():
+    if ACTIVE:
+        ACTIVE.count("retries")
+
+
+def count_cache_hit(kind, amount=1):
+    if ACTIVE and amount:
+        ACTIVE.count("cache_hits", amount, kind)
+
+
+@contextmanager
+def stage(name):
+    """
+    Attribute the wall time, CPU time, peak memory and counters of the block to
+    stage `name`.
+    """
+    profile = ACTIVE
+    if profile is None:
+        yield
+        return
+    with profile.lock:
+        # NOTE: bank the peaks so far before the mark is reset
+        recent = recent_peak_rss()
+        if recent is not None:
+            profile.max_rss = max(profile.max_rss, recent)
+            if profile.peaks and profile.peaks[-1] is not None:
+                profile.peaks[-1] = max(profile.peaks[-1], recent)
+        profile.peaks.append(0 if reset_peak_rss() else None)
+        profile.stack.append(name)
+        profile.current()["calls"] += 1
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        with profile.lock:
+            stats = profile.current()
+            stats["wall"] += time.perf_counter() - wall
+            stats["cpu"] += time.process_time() - cpu
+            peak = profile.peaks.pop()
+            if peak is not None:
+                peak = max(peak, recent_peak_rss())
+                stats["peak_rss"] = max(stats["peak_rss"] or 0, peak)
+                if profile.peaks and profile.peaks[-1] is not None:
+                    profile.peaks[-1] = max(profile.peaks[-1], peak)
+            else:
+                stats["peak_rss"] = None
+            profile.stack.pop()
+
+
+class InstrumentedProvider(BaseProvider):
+    """
+    Counts the requests and response sizes of calls made through web3.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.endpoint_uri = getattr(provider, "endpoint_uri", None)
+
+    def make_request(self, method, params):
+        response = self.provider.make_request(method, params)
+        count_rpc(
+            method,
+            len(json.dumps(params, default=encode_hex)),
+            len(json.dumps(response, default=encode_hex)),
+        )
+        return response
+
+    def isConnected(self):
+        return self.provider.isConnected()
+
+
+@contextmanager
+def profile(name, path=None):
+    """
+    Profile a pipeline run and write the report to `path`, by default a new
+    file in `PROFILES_DIR`.
+    """
+    global ACTIVE
+    previous = ACTIVE
+    ACTIVE = Profile(name)
+    provider = web3.provider
+    if provider is not None:
+        web3.provider = InstrumentedProvider(provider)
+    try:
+        yield ACTIVE
+    finally:
+        if provider is not None:
+            web3.provider = provider
+        report = ACTIVE.report()
+        ACTIVE = previous
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(report["started"]))
+            path = Path(PROFILES_DIR) / f"{name}-{stamp}.json"
+        os.makedirs(Path(path).parent, exist_ok=True)
+        json.dump(report, open(path, "wt"), indent=2)
+        print_report(report)
+        print(f"profile written to {path}")
+
+
+def print_report(report):
+    print(f"{'stage':<24} {'wall':>9} {'cpu':>9} {'rpc':>7} {'MB in':>8} {'rss MB':>8}")
+    for name, stats in report["stages"].items():
+        print(
+            f"{name:<24} {stats['wall']:>8.2f}s {stats['cpu']:>8.2f}s "
+            f"{sum(stats['rpc'].values()):>7} {stats['bytes_received'] / 1e6:>8.2f} "
+            f"{rss_mb(stats['peak_rss']):>8}"
+        )
+
+
+def rss_mb(rss):
+    return "-" if rss is None else f"{rss / 1e6:.1f}"
@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from hashlib import sha256
+from pathlib import Path
+
+from brownie import web3
+from eth_utils import encode_hex
+from web3.providers.base import BaseProvider
+
+from scripts import blocks, contracts, ledger, logs, rpc
+
+RECORDINGS_DIR = "snapshot/recordings"
+# NOTE: index entries are (request digest, offset, length) of a compressed record
+ENTRY = struct.Struct("<16sQI")
+
+
+class NotRecorded(LookupError):
+    """
+    A replayed request that was not seen while recording.
+    """
+
+
+class Recording:
+    """
+    RPC responses in an append-only store, indexed by a digest of the request.
+
+    `data` holds zlib-compressed json records, `index` a fixed-width entry per
+    record, which is read into a dict on open so lookups cost one seek.
+
+    `eth_getLogs` responses are indexed by their filter without the block range
+    and replayed for any range the recorded ones cover, because concurrent
+    scans don't split ranges the same way twice.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        if mode == "w":
+            if self.path.exists():
+                shutil.rmtree(self.path)
+            os.makedirs(self.path)
+            open(self.path / "data", "wb").close()
+            open(self.path / "index", "wb").close()
+        self.entries = {}
+        with open(self.path / "index", "rb") as fp:
+            for digest, offset, length in ENTRY.iter_unpack(fp.read()):
+                self.entries.setdefault(digest, []).append((offset, length))
+        self.data = open(self.path / "data", "a+b" if mode == "w" else "rb")
+        self.index = open(self.path / "index", "ab") if mode == "w" else None
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def close(self):
+        self.data.close()
+        if self.index:
+            self.index.close()
+
+    def put(self, digest, record):
+        blob = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+        with self.lock:
+            offset = self.data.seek(0, os.SEEK_END)
+            self.data.write(blob)
+            self.index.write(ENTRY.pack(digest, offset, len(blob)))
+            self.entries.setdefault(digest, []).append((offset, len(blob)))
+
+    def get(self, digest):
+        records = []
+        with self.lock:
+            for offset, length in self.entries.get(digest, []):
+                self.data.seek(offset)
+                records.append(json.loads(zlib.decompress(self.data.read(length))))
+        return records
+
+    def record(self, method, params, result=None, error=None):
+        if method == "eth_getLogs":
+            if error is None:
+                lo, hi = block_range(params)
+                self.put(request_digest(method, params), [lo, hi, result])
+            return
+        response = {"error": error} if error is not None else {"result": result}
+        self.put(request_digest(method, params), response)
+
+    def replay(self, method, params):
+        """
+        The recorded `{"result": ...}` or `{"error": ...}` of a request.
+        """
+        records = self.get(request_digest(method, params))
+        if method == "eth_getLogs":
+            return {"result": replay_logs(records, *block_range(params))}
+        if not records:
+            raise NotRecorded(f"{method} {params}")
+        return records[-1]
+
+
+def request_digest(method, params):
+    if method == "eth_getLogs":
+        (params,) = params
+        params = {k: v for k, v in params.items() if k not in {"fromBlock", "toBlock"}}
+    request = json.dumps([method, params], sort_keys=True, default=encode_hex)
+    return sha256(request.encode()).digest()[:16]
+
+
+def block_range(params):
+    (params,) = params
+    return int(params["fromBlock"], 16), int(params["toBlock"], 16)
+
+
+def replay_logs(records, lo, hi):
+    covered = lo
+    found = {}
+    for start, end, result in sorted(records, key=lambda record: record[:2]):
+        if end < covered:
+            continue
+        if start > covered:
+            break
+        for log in result:
+            if lo <= int(log["blockNumber"], 16) <= hi:
+                found[log["blockNumber"], log["logIndex"]] = log
+        covered = end + 1
+        if covered > hi:
+            return list(found.values())
+    raise NotRecorded(f"eth_getLogs {lo}-{hi}")
+
+
+class RecordingProvider(BaseProvider):
+    """
+    Passes requests to `provider` and records every response.
+    """
+
+    def __init__(self, provider, recording):
+        self.provider = provider
+        self.recording = recording
+        self.endpoint_uri = getattr(provider, "endpoint_uri", None)
+
+    def make_request(self, method, params):
+        response = self.provider.make_request(method, params)
+        self.recording.record(
+            method, params, response.get("result"), response.get("error")
+        )
+        return response
+
+    def isConnected(self):
+        return self.provider.isConnected()
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Serves recorded responses without a node.
+    """
+
+    def __init__(self, recording, endpoint_uri=None):
+        self.recording = recording
+        self.endpoint_uri = endpoint_uri
+
+    def make_request(self, method, params):
+        return {"jsonrpc": "2.0", "id": 0, **self.recording.replay(method, params)}
+
+    def isConnected(self):
+        return True
+
+
+class RecordingClient(rpc.Client):
+    def __init__(self, url, recording, **kwargs):
+        super().__init__(url, **kwargs)
+        self.recording = recording
+
+    def batch(self, calls, return_exceptions=False):
+        calls = list(calls)
+        results = super().batch(calls, return_exceptions=True)
+        for (method, params), result in zip(calls, results):
+            if isinstance(result, rpc.RPCError):
+                self.recording.record(method, params, error=result.args[0])
+            else:
+                self.recording.record(method, params, result)
+        return check_errors(results, return_exceptions)
+
+
+class ReplayClient(rpc.Client):
+    def __init__(self, recording):
+        self.recording = recording
+
+    def batch(self, calls, return_exceptions=False):
+        results = []
+        for method, params in calls:
+            response = self.recording.replay(method, params)
+            if "error" in response:
+                results.append(rpc.RPCError(response["error"]))
+            else:
+                results.append(response["result"])
+        return check_errors(results, return_exceptions)
+
+    def close(self):
+        pass
+
+
+def check_errors(results, return_exceptions):
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, rpc.RPCError):
+                raise result
+    return results
+
+
+@contextmanager
+def session(name, mode):
+    """
+    Route web3 and the pooled client through a recording, with fresh local
+    caches so every request of the run goes through it.
+    """
+    recording = Recording(Path(RECORDINGS_DIR) / name, mode)
+    provider = web3.provider
+    url = getattr(provider, "endpoint_uri", None)
+    url = str(url) if url else None
+    if mode == "w":
+        web3.provider = RecordingProvider(provider, recording)
+        client = RecordingClient(url, recording) if url else None
+    else:
+        web3.provider = ReplayProvider(recording, url)
+        client = ReplayClient(recording)
+    previous = rpc.CLIENTS.pop(url, None)
+    if url:
+        rpc.CLIENTS[url] = client
+    scratch = Path(RECORDINGS_DIR) / f"{name}-caches"
+    overrides = {
+        (logs, "CHECKPOINTS_DIR"): str(scratch / "checkpoints"),
+        (ledger, "LEDGERS_DIR"): str(scratch / "ledgers"),
+        (blocks, "BLOCK_TIMES"): str(scratch / "block-times.json"),
+        (contracts, "CODE_CACHE"): str(scratch / "code-{block}.json"),
+    }
+    originals = {(module, attr): getattr(module, attr) for module, attr in overrides}
+    for (module, attr), value in overrides.items():
+        setattr(module, attr, value)
+    try:
+        yield recording
+    finally:
+        for (module, attr), value in originals.items():
+            setattr(module, attr, value)
+        shutil.rmtree(scratch, ignore_errors=True)
+        web3.provider = provider
+        rpc.CLIENTS.pop(url, None)
+        if previous is not None:
+            rpc.CLIENTS[url] = previous
+        if client is not None:
+            client.close()
+        recording.close()
+
+
+def run_pipeline(name, mode):
+    with session(name, mode) as recording:
+        # NOTE: snapshot creates contract objects on import, those requests count too
+        from scripts import snapshot
+
+        snapshot.REFRESH = True
+        try:
+            snapshot.main()
+        finally:
+            snapshot.REFRESH = False
+        print(f"{len(recording)} responses in {recording.path}")
+
+
+def record(name="main"):
+    """
+    Run the whole pipeline against the node, recording every response.
+    """
+    run_pipeline(name, "w")
+
+
+def replay(name="main"):
+    """
+    Rerun the whole pipeline from a recording, without a node.
+    Artifacts are rewritten in place, so `git diff snapshot` shows any change.
+    """
+    run_pipeline(name, "r")
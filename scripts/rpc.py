@@ -0,0 +1,259 @@
+import asyncio
+import json
+import threading
+
+import aiohttp
+from brownie import web3
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from scripts.profiling import count_bytes, count_retry, count_rpc
+
+CONCURRENCY = 16  # requests in flight, also the size of the connection pool
+BATCH_SIZE = 100  # calls per JSON-RPC batch
+RETRIES = 5
+BACKOFF = 0.5  # seconds before the first retry, doubled on every retry
+TIMEOUT = 120
+RETRY_STATUS = {429, 502, 503, 504}
+HEADERS = {"Content-Type": "application/json"}
+
+
+class RPCError(ValueError):
+    """
+    JSON-RPC error response, a ValueError like the ones web3 raises.
+    """
+
+
+class AsyncClient:
+    """
+    JSON-RPC over pooled keep-alive http connections.
+
+    At most `concurrency` requests are in flight at once. Dropped connections
+    and throttling responses are retried with exponential backoff. Timeouts and
+    JSON-RPC errors go straight to the caller, who can split the request.
+    """
+
+    def __init__(
+        self,
+        url,
+        concurrency=CONCURRENCY,
+        batch_size=BATCH_SIZE,
+        retries=RETRIES,
+        backoff=BACKOFF,
+    ):
+        self.url = url
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+        self.requests = 0
+        self.retried = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=TIMEOUT),
+            )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, params):
+        (result,) = await self.batch([(method, params)])
+        return result
+
+    async def batch(self, calls, return_exceptions=False):
+        """
+        Results of `(method, params)` calls, sent as concurrent batches.
+        Errors are raised, or returned in place with `return_exceptions`.
+        """
+        calls = list(calls)
+        chunks = [
+            calls[i : i + self.batch_size]
+            for i in range(0, len(calls), self.batch_size)
+        ]
+        parts = await asyncio.gather(*[self.post_batch(chunk) for chunk in chunks])
+        results = [result for part in parts for result in part]
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, RPCError):
+                    raise result
+        return results
+
+    async def post_batch(self, calls):
+        payload = [
+            {"jsonrpc": "2.0", "id": n, "method": method, "params": params}
+            for n, (method, params) in enumerate(calls)
+        ]
+        for method, _ in calls:
+            count_rpc(method)
+        response = await self.post(payload if len(payload) > 1 else payload[0])
+        if isinstance(response, dict):
+            if "id" not in response or response["id"] is None:
+                # NOTE: the whole batch was refused
+                raise RPCError(response.get("error", response))
+            response = [response]
+        results = [None] * len(calls)
+        for item in response:
+            if "error" in item:
+                results[item["id"]] = RPCError(item["error"])
+            else:
+                results[item["id"]] = item["result"]
+        return results
+
+    async def post(self, payload):
+        body = json.dumps(payload).encode()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                count_retry()
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            self.requests += 1
+            try:
+                async with self.semaphore, self.session.post(
+                    self.url, data=body, headers=HEADERS
+                ) as response:
+                    if response.status in RETRY_STATUS:
+                        error = aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                        )
+                        continue
+                    response.raise_for_status()
+                    raw = await response.read()
+                    count_bytes(len(body), len(raw))
+                    return json.loads(raw)
+            except asyncio.TimeoutError:
+                raise
+            except aiohttp.ClientConnectionError as e:
+                error = e
+        raise error
+
+
+class Client:
+    """
+    Blocking front for `AsyncClient`, with the event loop in a daemon thread so
+    calls from any thread share one connection pool and concurrency limit.
+
+    Also provides the parts of `web3.eth` the scripts use, returning the same
+    shapes, so it can be swapped in wherever `web3.eth` was used.
+    """
+
+    def __init__(self, url, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.client = AsyncClient(url, **kwargs)
+        self.run(self.client.open())
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def request(self, method, params):
+        (result,) = self.batch([(method, params)])
+        return result
+
+    def batch(self, calls, return_exceptions=False):
+        return self.run(self.client.batch(calls, return_exceptions))
+
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @property
+    def blockNumber(self):
+        return int(self.request("eth_blockNumber", []), 16)
+
+    def getBlock(self, block):
+        return format_block(self.request("eth_getBlockByNumber", [hex(block), False]))
+
+    def getCode(self, address, block):
+        return HexBytes(self.request("eth_getCode", [address, hex(block)]))
+
+    def getLogs(self, params):
+        logs = self.request("eth_getLogs", [format_filter(params)])
+        return [format_log(log) for log in logs]
+
+
+def format_filter(params):
+    return {
+        key: hex(value) if isinstance(value, int) else value
+        for key, value in params.items()
+    }
+
+
+def format_block(block):
+    return AttributeDict(
+        dict(
+            block,
+            number=int(block["number"], 16),
+            timestamp=int(block["timestamp"], 16),
+            hash=HexBytes(block["hash"]),
+        )
+    )
+
+
+def format_log(log):
+    return AttributeDict(
+        {
+            "address": to_checksum_address(log["address"]),
+            "topics": [HexBytes(topic) for topic in log["topics"]],
+            "data": log["data"],
+            "blockNumber": int(log["blockNumber"], 16),
+            "transactionHash": HexBytes(log["transactionHash"]),
+            "transactionIndex": int(log["transactionIndex"], 16),
+            "blockHash": HexBytes(log["blockHash"]),
+            "logIndex": int(log["logIndex"], 16),
+            "removed": log.get("removed", False),
+        }
+    )
+
+
+# NOTE: one client per endpoint, shared by every module
+CLIENTS = {}
+
+
+def connect(url):
+    if url not in CLIENTS:
+        CLIENTS[url] = Client(url)
+    return CLIENTS[url]
+
+
+def get_eth():
+    """
+    The pooled client when the node is reached over http, `web3.eth` otherwise.
+    """
+    url = getattr(web3.provider, "endpoint_uri", None)
+    if url and str(url).startswith("http"):
+        return connect(str(url))
+    return web3.eth
+
+
+def request_batch(calls):
+    """
+    Raw results of (method, params) calls, in pooled JSON-RPC batches when the
+    node is reached over http, one provider request each otherwise.
+    """
+    eth = get_eth()
+    if isinstance(eth, Client):
+        return eth.batch(calls)
+    results = []
+    for method, params in calls:
+        response = web3.provider.make_request(method, params)
+        if "error" in response:
+            raise RPCError(response["error"])
+        results.append(response["result"])
+    return results
@@ -1,21 +1,35 @@
 import json
+import inspect
 import os
 import pickle
+import random
+import sys
 from collections import Counter, defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from fractions import Fraction
 from functools import wraps
-from itertools import zip_longest
+from hashlib import sha256
 from pathlib import Path
 
 import toml
-from brownie import MerkleDistributor, Wei, accounts, chain, interface, web3
+from brownie import MerkleDistributor, Wei, accounts, interface
 from click import secho
 from eth_abi.packed import encode_abi_packed
-from eth_utils import encode_hex, event_abi_to_log_topic
-from hexbytes import HexBytes
-from toolz import groupby, valfilter
-from tqdm import tqdm, trange
+from eth_utils import encode_hex
+from toolz import valfilter
+
+from scripts.allocation import Buckets, allocate, stage_buckets
+from scripts.blocks import BlockTimes, blocks_at
+from scripts.claims import claim_batches, claim_many_args, load_claim, write_claims
+from scripts.columnar import load_columns, write_columns
+from scripts.contracts import code_sizes, find_pairs
+from scripts.decoder import EventDecoder
+from scripts.ledger import Ledger, advance_ledgers
+from scripts.logs import get_logs
+from scripts.merkle import MerkleTree
+from scripts.multicall import MULTICALL_DEPLOY, batch_call, batch_call_blocks
+from scripts.profiling import count_cache_hit, profile, stage
+from scripts.spankbank import period_end_times, replay_stakers
+from scripts.status import claimed_indices, read_bitmap, word_count
 
 DISTRIBUTOR_ADDRESS = ...
 DISTRIBUTION_TOTAL = Wei("695060.118 ether")
@@ -41,26 +55,45 @@ uni_deploy = 10861674  # https://etherscan.io/tx/0x4b37d2f343608457ca3322accdab2
 spank_deploy = 4590304  # https://etherscan.io/tx/0x249effe35529e648be34903167e9cfaac757d9f12cc21c8a91da207519ab693e
 uniswap_v2_deploy = 10000835  # https://etherscan.io/tx/0xc31d7e7e85cab1d38ce1b8ac17e821ccd47dbde00f9d57f2bd8613bff9428396
 spankbank = interface.SpankBank("0x1ECB60873E495dDFa2a13A8F4140e490dd574E6F")
-multicall = interface.Multicall("0xeefBa1e63905eF1D7ACbA5a8513c70307C1cE441")
 spank = interface.ERC20("0x42d6622deCe394b54999Fbd73D108123806f6a18")
-ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
 UNISWAP_FACTORY = "0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f"
+STAGES = {}
+REFRESH = False  # recompute every stage, used to record and replay whole runs
+# NOTE: patch the last tree for late corrections, the root then differs from a fresh build
+INCREMENTAL = False
+MERKLE_TREE = "snapshot/checkpoints/merkle-tree.pickle"
+CHANGED_CLAIMS = "snapshot/checkpoints/changed-claims.json"
+STAGES_MANIFEST = Path("snapshot/stages.json")
 
 
 def main():
-    logs = fetch_logs()
-    events = decode_logs(logs)
-    points = calc_spankbank_points(events)
-    staked_balances = calc_spankbank_spank(events)
-    snapshot_balances = calc_spank()
-    contract_balances = find_contracts(snapshot_balances)
-    uni_lps = calc_uniswap(contract_balances)
-    snapshot_balances = unwrap_balances(snapshot_balances, uni_lps)
-    distribution = prepare_distribution(points, staked_balances, snapshot_balances)
-    tree = prepare_merkle_tree(distribution)
-
-
-def cached(path):
+    with profile("snapshot"):
+        logs = fetch_logs()
+        events = decode_logs(logs)
+        points = calc_spankbank_points(events)
+        staked_balances = calc_spankbank_spank(events)
+        snapshot_balances = calc_spank()
+        contract_balances = find_contracts(snapshot_balances)
+        uni_lps = calc_uniswap(contract_balances)
+        snapshot_balances = unwrap_balances(snapshot_balances, uni_lps)
+        distribution = prepare_distribution(points, staked_balances, snapshot_balances)
+        tree = prepare_merkle_tree(distribution)
+        with stage("write_claims"):
+            write_claims(tree)
+
+
+def cached(path, deps=(), params=(), code=(), abi=None):
+    """
+    Cache a pipeline stage at `path`, keyed by a hash of its source and of every
+    project helper it reaches, the values of the module-level `params` it uses,
+    the source of helpers named in `code` that are only reached indirectly,
+    and the keys of the upstream stages in `deps`. Stages stored as `.columns`
+    that return decoded events pass the `abi` they were decoded with.
+
+    A stage reruns when its key changes, which also changes the keys of every
+    stage downstream of it. An artifact without a recorded key reruns too,
+    unless `adopt` took it as up to date.
+    """
     path = Path(path)
     codecs = {
         ".toml": {
@@ -75,141 +108,251 @@ def cached(path):
             "read": lambda: pickle.load(path.open("rb")),
             "write": lambda result: pickle.dump(result, path.open("wb")),
         },
+        # NOTE: fresh results are reloaded so stages always get the column store
+        ".columns": {
+            "read": lambda: load_columns(path),
+            "write": lambda result: write_columns(result, path, abi),
+            "reload": True,
+        },
     }
     codec = codecs[path.suffix]
 
     def decorator(func):
+        STAGES[func.__name__] = {
+            "func": func,
+            "path": str(path),
+            "deps": list(deps),
+            "params": list(params),
+            "code": list(code),
+        }
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            if path.exists():
+            with stage(func.__name__):
+                return run(*args, **kwargs)
+
+        def run(*args, **kwargs):
+            key = stage_key(func.__name__)
+            recorded = load_stages().get(func.__name__, {}).get("key")
+            if not REFRESH and path.exists() and recorded == key:
                 print("load from cache", path)
+                count_cache_hit("stage")
                 return codec["read"]()
             else:
+                if not REFRESH and path.exists() and recorded is None:
+                    secho(f"no key recorded for {path}, rebuilding it", fg="yellow")
                 result = func(*args, **kwargs)
                 if result is None:
                     return
                 os.makedirs(path.parent, exist_ok=True)
                 codec["write"](result)
+                record_stage(func.__name__, key)
                 print("write to cache", path)
-                return result
+                return codec["read"]() if codec.get("reload") else result
 
         return wrapper
 
     return decorator
 
 
-@cached("snapshot/01-logs.pickle")
+def stage_key(name):
+    stage = STAGES[name]
+    key = sha256()
+    code = [stage["func"]] + [stage["func"].__globals__[name] for name in stage["code"]]
+    for obj in code + stage_helpers(stage["func"], code):
+        key.update(inspect.getsource(obj).encode())
+    for param in stage["params"]:
+        key.update(f"{param}={stage['func'].__globals__[param]!r}".encode())
+    for dep in stage["deps"]:
+        key.update(stage_key(dep).encode())
+    return key.hexdigest()
+
+
+def stage_helpers(func, skip=()):
+    """
+    Functions and classes of this project that `func` reaches through module
+    globals, directly or through other helpers, sorted by qualified name.
+    Other stages are keyed as `deps` and profiling does not change results,
+    so neither is followed.
+    """
+    package = func.__module__.split(".")[0]
+    stages = {stage["func"] for stage in STAGES.values()}
+    found = {}
+    pending = [func]
+    while pending:
+        obj = pending.pop()
+        namespace = vars(sys.modules[obj.__module__])
+        for code in code_objects(obj):
+            for name in code.co_names:
+                value = namespace.get(name)
+                value = getattr(value, "__wrapped__", value)
+                if not (inspect.isfunction(value) or inspect.isclass(value)):
+                    continue
+                module = value.__module__
+                if module.split(".")[0] != package or module.endswith(".profiling"):
+                    continue
+                qualname = f"{module}.{value.__qualname__}"
+                if value in stages or value in skip or qualname in found:
+                    continue
+                found[qualname] = value
+                pending.append(value)
+    return [found[qualname] for qualname in sorted(found)]
+
+
+def code_objects(obj):
+    """
+    Code of a function or of every method of a class, with the code nested in it.
+    """
+    if inspect.isclass(obj):
+        funcs = []
+        for attr in vars(obj).values():
+            attr = attr.fget if isinstance(attr, property) else attr
+            attr = getattr(attr, "__func__", attr)
+            if inspect.isfunction(attr):
+                funcs.append(attr)
+    else:
+        funcs = [obj]
+    pending = [func.__code__ for func in funcs]
+    while pending:
+        code = pending.pop()
+        yield code
+        pending.extend(const for const in code.co_consts if inspect.iscode(const))
+
+
+def load_stages():
+    if not STAGES_MANIFEST.exists():
+        return {}
+    return json.load(STAGES_MANIFEST.open())
+
+
+def record_stage(name, key):
+    stages = load_stages()
+    stages[name] = {
+        "path": STAGES[name]["path"],
+        "key": key,
+        "deps": STAGES[name]["deps"],
+    }
+    os.makedirs(STAGES_MANIFEST.parent, exist_ok=True)
+    json.dump(stages, STAGES_MANIFEST.open("wt"), indent=2)
+
+
+def status():
+    """
+    Show which stages are up to date and which will rerun.
+    """
+    stages = load_stages()
+    for name, stage in STAGES.items():
+        recorded = stages.get(name, {}).get("key")
+        exists = Path(stage["path"]).exists()
+        fresh = exists and recorded == stage_key(name)
+        note = " (no key recorded)" if exists and recorded is None else ""
+        secho(f"{name:<24} {stage['path']}{note}", fg="green" if fresh else "yellow")
+
+
+def adopt():
+    """
+    Record the current key of every artifact that has none, taking it as up to
+    date. Only run this on artifacts known to match the code, as in a fresh
+    checkout before anything is changed.
+    """
+    stages = load_stages()
+    for name, stage in STAGES.items():
+        if name not in stages and Path(stage["path"]).exists():
+            record_stage(name, stage_key(name))
+            secho(f"adopted {stage['path']}", fg="yellow")
+
+
+@cached("snapshot/01-logs.columns", params=["spankbank_deploy", "uni_deploy"])
 def fetch_logs():
-    logs = []
-    step = 100000
     # NOTE: start from spankbank deploy since we need to catch all stakers
-    for start in trange(spankbank_deploy, uni_deploy, step):
-        end = min(start + step - 1, uni_deploy)
-        logs.extend(
-            web3.eth.getLogs(
-                {"address": str(spankbank), "fromBlock": start, "toBlock": end}
-            )
-        )
-    return logs
+    return get_logs(
+        {"address": str(spankbank)},
+        spankbank_deploy,
+        uni_deploy,
+        checkpoint="spankbank-logs",
+        step=100000,
+    )
 
 
-@cached("snapshot/02-events.pickle")
+@cached("snapshot/02-events.columns", deps=["fetch_logs"], abi=spankbank.abi)
 def decode_logs(logs):
-    spankbank = web3.eth.contract(None, abi=interface.SpankBank.abi)
-    topics = {
-        HexBytes(event_abi_to_log_topic(abi)): abi["name"]
-        for abi in interface.SpankBank.abi
-        if abi["type"] == "event"
-    }
-    events = []
-    for log in logs:
-        name = topics[log["topics"][0]]
-        events.append(spankbank.events[name]().processLog(log))
-
-    return events
+    return EventDecoder(spankbank.abi).decode_all(logs)
 
 
-@cached("snapshot/03-spankpoints.json")
+@cached("snapshot/03-spankpoints.json", deps=["decode_logs"], params=["uni_deploy"])
 def calc_spankbank_points(events):
     """
     Get active points for each staker for each period from CheckInEvent.
     """
     periods = defaultdict(dict)
-    events = groupby("event", events)
-    for event in events["CheckInEvent"]:
-        if event.blockNumber > uni_deploy:
-            continue
+    events = events.groupby()
+    for event in events["CheckInEvent"].between(0, uni_deploy):
         periods[event.args.period][event.args.staker] = event.args.spankPoints
     return dict(periods)
 
 
-@cached("snapshot/04-spankbank.json")
+@cached(
+    "snapshot/04-spankbank.json",
+    deps=["decode_logs"],
+    params=["spankbank_deploy", "uni_deploy", "MULTICALL_DEPLOY"],
+)
 def calc_spankbank_spank(events):
     """
-    Get all stakers from [StakeEvent, SplitStakeEvent].
     For each period determine the block closest to period end time.
-    Get SPANK staked for each staker at end block of each period.
+    Replay [StakeEvent, SplitStakeEvent, WithdrawStakeEvent] to get SPANK staked
+    for each staker at end block of each period.
     """
-    periods = {}
-    events = groupby("event", events)
+    periods_info = calc_spankbank_periods(events)
+    print(periods_info)
+    return replay_stakers(events, periods_info, window_until=MULTICALL_DEPLOY)
+
+
+def calc_spankbank_periods(events):
+    times = BlockTimes()
+    end_times = period_end_times(events, times[spankbank_deploy], times[uni_deploy])
+    end_blocks = blocks_at(list(end_times.values()), times)
+    print(f"resolved {len(end_blocks)} period end blocks with {times.fetched} fetches")
+    return {
+        period: {"end_time": end_time, "end_block": end_block}
+        for (period, end_time), end_block in zip(end_times.items(), end_blocks)
+    }
+
+
+def check_spankbank_replay(sample=50):
+    """
+    Compare replayed SPANK staked with on-chain reads for a sample of stakers.
+    """
+    events = decode_logs(fetch_logs())
+    periods = {
+        int(period): info for period, info in calc_spankbank_spank(events).items()
+    }
+    # NOTE: compare against the unfiltered replay since on-chain reads have no window
+    replayed = replay_stakers(events, periods)
+    events = events.groupby()
     new_stakers = {event.args.staker for event in events["StakeEvent"]}
     split_stakers = {event.args.newAddress for event in events["SplitStakeEvent"]}
     stakers = sorted(new_stakers | split_stakers)
-    print(len(stakers), "stakers")
-    snapshot_end_time = chain[uni_deploy].timestamp
-    calls = [
-        [str(spankbank), spankbank.stakers.encode_input(staker)] for staker in stakers
-    ]
-    _, results = multicall.aggregate.call(calls)
-    staker_info = {
-        staker: spankbank.stakers.decode_output(resp)
-        for staker, resp in zip(stakers, results)
-    }
-    periods_end_times = {
-        period: spankbank.periods(period)[5]
-        for period in range(1, spankbank.currentPeriod() + 1)
-    }
-    periods_info = {
-        period: {"end_time": end_time, "end_block": timestamp_to_block_number(end_time)}
-        for period, end_time in periods_end_times.items()
-        if end_time <= snapshot_end_time
-    }
-    print(periods_info)
-    for period, info in periods_info.items():
-        if info["end_time"] > snapshot_end_time:
-            break
-        periods[period] = {
-            "end_block": info["end_block"],
-            "end_time": info["end_time"],
-            "stakers": {},
-        }
-        print(f"period {period} snapshot block {info['end_block']}")
-        try:
-            _, results = multicall.aggregate.call(
-                calls, block_identifier=info["end_block"]
-            )
-            for staker, resp in zip(stakers, results):
-                spank_staked, *_ = spankbank.stakers.decode_output(resp)
-                if spank_staked > 0:
-                    periods[period]["stakers"][staker] = spank_staked
-        except ValueError as e:
-            print("multicall reverted, fall back to slow method")
-            period_stakers = [
-                staker
-                for staker in stakers
-                if staker_info[staker][1] <= period and staker_info[staker][2] >= period
-            ]
-            for staker in tqdm(period_stakers):
-                spank_staked, *_ = spankbank.stakers(
-                    staker, block_identifier=info["end_block"]
+    stakers = random.Random(sample).sample(stakers, min(sample, len(stakers)))
+    calls = [(spankbank, spankbank.stakers, staker) for staker in stakers]
+    results = batch_call_blocks(
+        calls, [info["end_block"] for info in replayed.values()]
+    )
+    mismatches = 0
+    for period, info in replayed.items():
+        for staker, (spank_staked, *_) in zip(stakers, results[info["end_block"]]):
+            if spank_staked != info["stakers"].get(staker, 0):
+                mismatches += 1
+                secho(
+                    f"period {period} {staker}: "
+                    f"replay {info['stakers'].get(staker, 0)} chain {spank_staked}",
+                    fg="red",
                 )
-                if spank_staked > 0:
-                    periods[period]["stakers"][staker] = spank_staked
-
-    return dict(periods)
+    if mismatches:
+        return secho(f"{mismatches} mismatches", fg="red")
+    secho(f"{len(stakers)} stakers match in {len(replayed)} periods", fg="green")
 
 
-@cached("snapshot/05-spank.json")
+@cached("snapshot/05-spank.json", params=["spank_deploy", "uni_deploy"])
 def calc_spank():
     """
     Snapshot SPANK balances at UNI deploy block.
@@ -219,37 +362,39 @@ def calc_spank():
     spank_deployer = "0xA7f00de671ebEB1b04C19a00842ff1d980847f0B"
     balances[spank_deployer] += 10 ** 27
     # NOTE: sanity check
-    for addr in [spank_deployer, str(spankbank)]:
-        assert balances[addr] == spank.balanceOf(addr, block_identifier=uni_deploy)
+    addrs = [spank_deployer, str(spankbank)]
+    calls = [(spank, spank.balanceOf, addr) for addr in addrs]
+    for addr, balance in zip(addrs, batch_call(calls, uni_deploy)):
+        assert balances[addr] == balance
     return balances
 
 
-@cached("snapshot/06-contracts.json")
+@cached("snapshot/06-contracts.json", deps=["calc_spank"])
 def find_contracts(balances):
-    pool = ThreadPoolExecutor(10)
-    codes = pool.map(web3.eth.getCode, balances)
-    contracts = {
-        user: balances[user]
-        for user, code in tqdm(zip(balances, codes), total=len(balances))
-        if code
-    }
+    # NOTE: code and factory() are read at the latest block, as the artifacts were
+    sizes = code_sizes(list(balances))
+    contracts = {user: balances[user] for user in balances if sizes[user]}
     print(f"{len(contracts)} contracts found")
     return contracts
 
 
-@cached("snapshot/07-uniswap.json")
+@cached(
+    "snapshot/07-uniswap.json",
+    deps=["find_contracts"],
+    params=["uniswap_v2_deploy", "uni_deploy", "UNISWAP_FACTORY"],
+)
 def calc_uniswap(contracts):
     replacements = {}
-    for address in contracts:
-        if not is_uniswap(address):
-            continue
-
+    pairs = find_pairs(contracts, UNISWAP_FACTORY)
+    # NOTE: lp shares of all pools come from a single transfer scan
+    lp_balances = transfers_to_balances_many(
+        [interface.ERC20(address) for address in pairs], uniswap_v2_deploy, uni_deploy
+    )
+    for address in pairs:
         # no need to check the pool contents since we already know the equivalent value
         # so we just grab the lp share distribution and distirbute the tokens pro-rata
 
-        balances = transfers_to_balances(
-            interface.ERC20(address), uniswap_v2_deploy, uni_deploy
-        )
+        balances = lp_balances[address]
         supply = sum(balances.values())
         if not supply:
             continue
@@ -264,7 +409,7 @@ def calc_uniswap(contracts):
     return replacements
 
 
-@cached("snapshot/08-unwrapped.json")
+@cached("snapshot/08-unwrapped.json", deps=["calc_spank", "calc_uniswap"])
 def unwrap_balances(balances, replacements):
     for remove, additions in replacements.items():
         balances.pop(remove)
@@ -274,68 +419,56 @@ def unwrap_balances(balances, replacements):
     return dict(Counter(balances).most_common())
 
 
-@cached("snapshot/09-distribution.json")
+@cached(
+    "snapshot/09-distribution.json",
+    deps=["calc_spankbank_points", "calc_spankbank_spank", "unwrap_balances"],
+    params=[
+        "DISTRIBUTION_TOTAL",
+        "POINTS_TOTAL",
+        "STAKED_TOTAL",
+        "SNAPSHOT_TOTAL",
+        "DUST",
+        "EXCLUDED",
+    ],
+)
 def prepare_distribution(points, staked_balances, snapshot_balances):
     assert POINTS_TOTAL + STAKED_TOTAL + SNAPSHOT_TOTAL == DISTRIBUTION_TOTAL
 
-    distribution = Counter()
-
-    points_amounts = Counter()
-    for period in points:
-        for user, amount in points[period].items():
-            if user in EXCLUDED:
-                continue
-            points_amounts[user] += amount
-    ratio = Fraction(POINTS_TOTAL, sum(points_amounts.values()))
-    for user, amount in points_amounts.items():
-        distribution[user] += int(amount * ratio)
-
-    staked_amounts = Counter()
-    for period in staked_balances:
-        for user, amount in staked_balances[period]["stakers"].items():
-            if user in EXCLUDED:
-                continue
-            staked_amounts[user] += amount
-    ratio = Fraction(STAKED_TOTAL, sum(staked_amounts.values()))
-    for user, amount in staked_amounts.items():
-        distribution[user] += int(amount * ratio)
-
-    snapshot_amounts = Counter()
-    for user, amount in snapshot_balances.items():
-        if user in EXCLUDED:
-            continue
-        snapshot_amounts[user] += amount
-    ratio = Fraction(SNAPSHOT_TOTAL, sum(snapshot_amounts.values()))
-    for user, amount in snapshot_amounts.items():
-        distribution[user] += int(amount * ratio)
-
-    distribution = {
-        user: amount for user, amount in distribution.items() if amount >= DUST
+    buckets = stage_buckets(points, staked_balances, snapshot_balances)
+    totals = {
+        "points": POINTS_TOTAL,
+        "staked": STAKED_TOTAL,
+        "snapshot": SNAPSHOT_TOTAL,
     }
-
-    distribution_total = sum(distribution.values())
-    ratio = Fraction(DISTRIBUTION_TOTAL, distribution_total)
-    distribution = {user: int(amount * ratio) for user, amount in distribution.items()}
-    assert sum(distribution.values()) <= DISTRIBUTION_TOTAL, "no inflation ser"
+    distribution = buckets.distribute(totals, DUST, EXCLUDED)
+    assert sum(distribution.values()) == DISTRIBUTION_TOTAL, "no inflation ser"
 
     print("target:", DISTRIBUTION_TOTAL.to("ether"))
     print("actual:", Wei(sum(distribution.values())).to("ether"))
     print("recipients:", len(distribution))
 
-    return dict(Counter(distribution).most_common())
+    return distribution
 
 
-@cached("snapshot/10-merkle-distribution.json")
+@cached(
+    "snapshot/10-merkle-distribution.json",
+    deps=["prepare_distribution"],
+    params=["INCREMENTAL"],
+)
 def prepare_merkle_tree(balances):
-    elements = [
-        (index, account, amount)
-        for index, (account, amount) in enumerate(balances.items())
-    ]
-    nodes = [
-        encode_hex(encode_abi_packed(["uint", "address", "uint"], el))
-        for el in elements
-    ]
-    tree = MerkleTree(nodes)
+    patched = patch_merkle_tree(balances) if INCREMENTAL else None
+    if patched:
+        tree, elements = patched
+    else:
+        elements = [
+            (index, account, amount)
+            for index, (account, amount) in enumerate(balances.items())
+        ]
+        tree = MerkleTree([pack_element(el) for el in elements])
+    if INCREMENTAL:
+        os.makedirs(Path(MERKLE_TREE).parent, exist_ok=True)
+        pickle.dump({"tree": tree, "elements": elements}, open(MERKLE_TREE, "wb"))
+    proofs = tree.get_all_proofs()
     distribution = {
         "merkleRoot": encode_hex(tree.root),
         "tokenTotal": hex(sum(balances.values())),
@@ -343,7 +476,7 @@ def prepare_merkle_tree(balances):
             user: {
                 "index": index,
                 "amount": hex(amount),
-                "proof": tree.get_proof(nodes[index]),
+                "proof": proofs[index],
             }
             for index, user, amount in elements
         },
@@ -352,6 +485,69 @@ def prepare_merkle_tree(balances):
     return distribution
 
 
+def pack_element(element):
+    return encode_hex(encode_abi_packed(["uint", "address", "uint"], element))
+
+
+def patch_merkle_tree(balances):
+    """
+    Apply the changed amounts to the last tree built, rehashing only the paths
+    of the changed leaves. Recipients keep their index, new ones are appended
+    and dropped ones stay in the tree with a zero amount.
+
+    The accounts whose claim changed are written to `CHANGED_CLAIMS`.
+    """
+    previous = last_merkle_tree()
+    if previous is None:
+        return None
+    tree, elements = previous
+    known = {account for _, account, _ in elements}
+    replaced = {}
+    for index, account, amount in list(elements):
+        if balances.get(account, 0) != amount:
+            elements[index] = (index, account, balances.get(account, 0))
+            replaced[pack_element((index, account, amount))] = pack_element(
+                elements[index]
+            )
+    added = []
+    for account, amount in balances.items():
+        if account not in known:
+            elements.append((len(elements), account, amount))
+            added.append(pack_element(elements[-1]))
+    changed = tree.update(replaced, added)
+    accounts = [elements[idx][1] for idx in tree.changed_claims(changed)]
+    json.dump(accounts, open(CHANGED_CLAIMS, "wt"), indent=2)
+    rehashed = sum(len(positions) for positions in changed)
+    print(
+        f"patched {len(replaced)} leaves and added {len(added)}, "
+        f"rehashed {rehashed} nodes, {len(accounts)} claims changed"
+    )
+    return tree, elements
+
+
+def last_merkle_tree():
+    """
+    The tree and elements of the last build. Patched trees are checkpointed to
+    `MERKLE_TREE`, a fresh build is rebuilt from its stage artifact.
+    """
+    if Path(MERKLE_TREE).exists():
+        previous = pickle.load(open(MERKLE_TREE, "rb"))
+        return previous["tree"], previous["elements"]
+    path = Path(STAGES["prepare_merkle_tree"]["path"])
+    if not path.exists():
+        return None
+    distribution = json.load(path.open())
+    elements = sorted(
+        (claim["index"], user, int(claim["amount"], 16))
+        for user, claim in distribution["claims"].items()
+    )
+    tree = MerkleTree([pack_element(el) for el in elements])
+    assert (
+        encode_hex(tree.root) == distribution["merkleRoot"]
+    ), "the last tree was patched and its checkpoint is missing"
+    return tree, elements
+
+
 def deploy():
     user = accounts.load(input("account: "))
     tree = json.load(open("snapshot/10-merkle-distribution.json"))
@@ -363,14 +559,16 @@ def deploy():
 def claim():
     claimer = accounts.load(input("account: "))
     dist = MerkleDistributor.at(DISTRIBUTOR_ADDRESS)
-    tree = json.load(open("snapshot/10-merkle-distribution.json"))
     claim_other = input("Claim for another account? y/n [default: n] ") or "n"
     assert claim_other in {"y", "n"}
     user = str(claimer) if claim_other == "n" else input("Enter address to claim for: ")
 
-    if user not in tree["claims"]:
+    try:
+        claim = load_claim(user)
+    except ValueError as e:
+        return secho(str(e), fg="red")
+    if claim is None:
         return secho(f"{user} is not included in the distribution", fg="red")
-    claim = tree["claims"][user]
     if dist.isClaimed(claim["index"]):
         return secho(f"{user} has already claimed", fg="yellow")
 
@@ -379,83 +577,39 @@ def claim():
     dist.claim(claim["index"], user, claim["amount"], claim["proof"], {"from": claimer})
 
 
+def claim_many():
+    """
+    Claim on behalf of every recipient who has not claimed yet, in batches.
+    """
+    sender = accounts.load(input("account: "))
+    dist = MerkleDistributor.at(DISTRIBUTOR_ADDRESS)
+    tree = json.load(open("snapshot/10-merkle-distribution.json"))
+    claimed = claimed_indices(read_bitmap(str(dist), word_count(tree)))
+    batches = claim_batches(tree["claims"], claimed)
+    pending = sum(len(batch) for batch in batches)
+    secho(f"{pending} unclaimed in {len(batches)} batches", fg="green")
+    for batch in batches:
+        dist.claimMany(*claim_many_args(batch), {"from": sender})
+
+
 def transfers_to_balances(contract, deploy_block, snapshot_block):
-    balances = Counter()
-    contract = web3.eth.contract(str(contract), abi=contract.abi)
-    step = 10000
-    for start in trange(deploy_block, snapshot_block, step):
-        end = min(start + step - 1, snapshot_block)
-        logs = contract.events.Transfer().getLogs(fromBlock=start, toBlock=end)
-        for log in logs:
-            if log["args"]["src"] != ZERO_ADDRESS:
-                balances[log["args"]["src"]] -= log["args"]["wad"]
-            if log["args"]["dst"] != ZERO_ADDRESS:
-                balances[log["args"]["dst"]] += log["args"]["wad"]
-
-    return valfilter(bool, dict(balances.most_common()))
-
-
-def timestamp_to_block_number(ts):
-    lo = 0
-    hi = chain.height - 30  # fix for "block not found"
-    threshold = 1
-    while abs(hi - lo) > threshold:
-        mid = (hi - lo) // 2 + lo
-        if chain[mid].timestamp < ts:
-            lo = mid
-        else:
-            hi = mid
-    return hi
-
-
-def is_uniswap(address):
-    try:
-        pair = interface.UniswapPair(address)
-        assert pair.factory() == UNISWAP_FACTORY
-        print(f"{address} is a uniswap pool")
-    except (AssertionError, ValueError):
-        return False
-    return True
-
-
-class MerkleTree:
-    def __init__(self, elements):
-        self.elements = sorted(set(web3.keccak(hexstr=el) for el in elements))
-        self.layers = MerkleTree.get_layers(self.elements)
-
-    @property
-    def root(self):
-        return self.layers[-1][0]
-
-    def get_proof(self, el):
-        el = web3.keccak(hexstr=el)
-        idx = self.elements.index(el)
-        proof = []
-        for layer in self.layers:
-            pair_idx = idx + 1 if idx % 2 == 0 else idx - 1
-            if pair_idx < len(layer):
-                proof.append(encode_hex(layer[pair_idx]))
-            idx //= 2
-        return proof
-
-    @staticmethod
-    def get_layers(elements):
-        layers = [elements]
-        while len(layers[-1]) > 1:
-            layers.append(MerkleTree.get_next_layer(layers[-1]))
-        return layers
-
-    @staticmethod
-    def get_next_layer(elements):
-        return [
-            MerkleTree.combined_hash(a, b)
-            for a, b in zip_longest(elements[::2], elements[1::2])
-        ]
+    """
+    Balances at `snapshot_block`, moving the closest persisted ledger forward.
+    """
+    ledger = Ledger.load(contract, deploy_block, snapshot_block)
+    ledger.advance(snapshot_block)
+    return valfilter(bool, dict(ledger.balances.most_common()))
 
-    @staticmethod
-    def combined_hash(a, b):
-        if a is None:
-            return b
-        if b is None:
-            return a
-        return web3.keccak(b"".join(sorted([a, b])))
+
+def transfers_to_balances_many(contracts, deploy_block, snapshot_block):
+    """
+    Balances of several tokens at `snapshot_block` from one address-list scan.
+    """
+    ledgers = [
+        Ledger.load(contract, deploy_block, snapshot_block) for contract in contracts
+    ]
+    advance_ledgers(ledgers, snapshot_block)
+    return {
+        ledger.contract.address: valfilter(bool, dict(ledger.balances.most_common()))
+        for ledger in ledgers
+    }
@@ -0,0 +1,78 @@
+from toolz import groupby
+
+
+def period_end_times(events, deploy_timestamp, until):
+    """
+    End time of each period from the SpankBank deploy time and period length.
+    Periods roll over back to back, so no state reads are needed.
+    """
+    (created,) = groupby("event", events)["SpankBankCreated"]
+    period_length = created.args.periodLength
+    end_times = {}
+    period = 1
+    while deploy_timestamp + (period + 1) * period_length <= until:
+        end_times[period] = deploy_timestamp + (period + 1) * period_length
+        period += 1
+    return end_times
+
+
+def replay_stakers(events, periods, window_until=None):
+    """
+    Rebuild `spankStaked` for each staker at the end block of each period.
+
+    Only StakeEvent, SplitStakeEvent and WithdrawStakeEvent change the stake,
+    CheckInEvent moves the ending period. For periods ending before
+    `window_until` only stakers inside their staking window are kept, which
+    is what the per-staker fallback of the on-chain reads did before multicall
+    was deployed.
+    """
+    events = sorted(events, key=lambda event: (event.blockNumber, event.logIndex))
+    windows = staking_windows(events)
+    staked = {}
+    result = {}
+    cursor = 0
+    for period, info in sorted(periods.items()):
+        while cursor < len(events) and events[cursor].blockNumber <= info["end_block"]:
+            apply_event(staked, events[cursor])
+            cursor += 1
+        windowed = window_until is not None and info["end_block"] < window_until
+        result[period] = {
+            "end_block": info["end_block"],
+            "end_time": info["end_time"],
+            "stakers": {
+                staker: amount
+                for staker, amount in staked.items()
+                if amount > 0
+                and not (
+                    windowed and not windows[staker][0] <= period <= windows[staker][1]
+                )
+            },
+        }
+    return result
+
+
+def apply_event(staked, event):
+    args = event.args
+    if event.event == "StakeEvent":
+        staked[args.staker] = args.spankAmount
+    elif event.event == "SplitStakeEvent":
+        staked[args.staker] -= args.spankAmount
+        staked[args.newAddress] = args.spankAmount
+    elif event.event == "WithdrawStakeEvent":
+        staked[args.staker] = 0
+
+
+def staking_windows(events):
+    """
+    Final (startingPeriod, endingPeriod) of each staker.
+    """
+    windows = {}
+    for event in events:
+        args = event.args
+        if event.event == "StakeEvent":
+            windows[args.staker] = [args.period, args.period + args.stakePeriods - 1]
+        elif event.event == "SplitStakeEvent":
+            windows[args.newAddress] = list(windows[args.staker])
+        elif event.event == "CheckInEvent":
+            windows[args.staker][1] = args.stakerEndingPeriod
+    return windows
@@ -0,0 +1,193 @@
+import json
+import os
+from pathlib import Path
+
+from eth_utils import encode_hex, event_abi_to_log_topic, to_checksum_address
+
+from scripts.decoder import EventDecoder
+from scripts.logs import get_logs
+from scripts.merkle import keccak
+from scripts.rpc import get_eth, request_batch
+
+STATUS_DIR = "snapshot/status"
+DISTRIBUTION = "snapshot/10-merkle-distribution.json"
+# NOTE: token and merkleRoot are immutable, owner and unlock take slots 0 and 1
+BITMAP_SLOT = 2
+WORD_BITS = 256
+CLAIMED_ABI = {
+    "type": "event",
+    "name": "Claimed",
+    "anonymous": False,
+    "inputs": [
+        {"name": "index", "type": "uint256", "indexed": False},
+        {"name": "account", "type": "address", "indexed": False},
+        {"name": "amount", "type": "uint256", "indexed": False},
+    ],
+}
+
+
+def main(address, deploy_block=None, path=DISTRIBUTION):
+    """
+    Claimed and unclaimed amounts of every recipient, from the distributor's
+    storage at the head and from its Claimed events, which must agree.
+    """
+    address = to_checksum_address(address)
+    distribution = json.load(open(path))
+    deploy_block = int(deploy_block) if deploy_block else find_deploy_block(address)
+    index = ClaimIndex.load(address, deploy_block)
+    index.update()
+    words = read_bitmap(address, word_count(distribution), index.block)
+    claimed = claimed_indices(words)
+    assert claimed == set(index.claimed), (
+        f"bitmap and events disagree on indices "
+        f"{sorted(claimed ^ set(index.claimed))[:10]}"
+    )
+    report = claim_report(distribution, claimed)
+    report["block"] = index.block
+    print(summary(report))
+    os.makedirs(STATUS_DIR, exist_ok=True)
+    json.dump(report, (Path(STATUS_DIR) / f"{address}-report.json").open("wt"))
+    return report
+
+
+def bitmap_slot(word):
+    """
+    Storage slot of `claimedBitMap[word]`.
+    """
+    return int.from_bytes(
+        keccak(word.to_bytes(32, "big") + BITMAP_SLOT.to_bytes(32, "big")), "big"
+    )
+
+
+def word_count(distribution):
+    last = max(claim["index"] for claim in distribution["claims"].values())
+    return last // WORD_BITS + 1
+
+
+def read_bitmap(address, words, block=None):
+    """
+    The first `words` words of `claimedBitMap` at `block`, 256 claims per word,
+    read as storage slots in one JSON-RPC batch.
+    """
+    block = "latest" if block is None else hex(block)
+    values = request_batch(
+        [
+            ("eth_getStorageAt", [address, hex(bitmap_slot(word)), block])
+            for word in range(words)
+        ]
+    )
+    return [int(value, 16) for value in values]
+
+
+def claimed_indices(words):
+    """
+    Indices whose bit is set in a list of bitmap words.
+    """
+    claimed = set()
+    for word, bits in enumerate(words):
+        while bits:
+            low = bits & -bits
+            claimed.add(word * WORD_BITS + low.bit_length() - 1)
+            bits ^= low
+    return claimed
+
+
+def find_deploy_block(address):
+    """
+    First block with code at `address`, by bisection over `eth_getCode`.
+    """
+    eth = get_eth()
+    lo, hi = 0, eth.blockNumber
+    assert len(eth.getCode(address, hi)), "no contract at address"
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if len(eth.getCode(address, mid)):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class ClaimIndex:
+    """
+    Claimed events of one distributor up to `block`, persisted with the block
+    as a cursor so an update only scans the logs since the last one.
+    """
+
+    def __init__(self, address, deploy_block, block=None, claimed=None):
+        self.address = to_checksum_address(address)
+        self.deploy_block = deploy_block
+        self.block = deploy_block - 1 if block is None else block
+        self.claimed = claimed or {}
+
+    @property
+    def path(self):
+        return Path(STATUS_DIR) / f"{self.address}.json"
+
+    @classmethod
+    def load(cls, address, deploy_block):
+        index = cls(address, deploy_block)
+        if not index.path.exists():
+            return index
+        data = json.load(index.path.open())
+        assert data["deploy_block"] == deploy_block, "index from another deploy block"
+        claimed = {
+            int(claim_index): claim for claim_index, claim in data["claimed"].items()
+        }
+        return cls(address, deploy_block, data["block"], claimed)
+
+    def update(self, block=None):
+        """
+        Add the Claimed events in (self.block, block] and persist the index.
+        """
+        block = get_eth().blockNumber if block is None else block
+        assert block >= self.block, "index can only move forward"
+        if block == self.block:
+            return self
+        params = {
+            "address": self.address,
+            "topics": [encode_hex(event_abi_to_log_topic(CLAIMED_ABI))],
+        }
+        decoder = EventDecoder([CLAIMED_ABI])
+        for log in get_logs(params, self.block + 1, block):
+            log = decoder.decode(log)
+            assert log.args.index not in self.claimed, "index claimed twice"
+            self.claimed[log.args.index] = {
+                "account": log.args.account,
+                "amount": log.args.amount,
+                "block": log.blockNumber,
+            }
+        self.block = block
+        self.save()
+        return self
+
+    def save(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        data = {
+            "distributor": self.address,
+            "deploy_block": self.deploy_block,
+            "block": self.block,
+            "claimed": self.claimed,
+        }
+        json.dump(data, self.path.open("wt"))
+
+
+def claim_report(distribution, claimed):
+    """
+    Split the recipients of `distribution` by whether their index is `claimed`.
+    """
+    report = {"claimed": {}, "unclaimed": {}}
+    for user, claim in distribution["claims"].items():
+        status = "claimed" if claim["index"] in claimed else "unclaimed"
+        report[status][user] = int(claim["amount"], 16)
+    for status in ["claimed", "unclaimed"]:
+        report[f"{status}_total"] = sum(report[status].values())
+    return report
+
+
+def summary(report):
+    return (
+        f"block {report['block']}: "
+        f"{len(report['claimed'])} claimed {report['claimed_total'] / 1e18:,.2f}, "
+        f"{len(report['unclaimed'])} unclaimed {report['unclaimed_total'] / 1e18:,.2f}"
+    )
@@ -0,0 +1,163 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+from time import perf_counter
+
+from eth_utils import encode_hex
+
+from scripts.allocation import stage_buckets
+from scripts.merkle import build_layers, keccak
+
+SWEEP_REPORT = "snapshot/sweep.json"
+BUCKETS = None  # set in each worker, so scenarios don't carry the weights
+
+
+def main(workers=None, path=SWEEP_REPORT):
+    """
+    Sweep dust thresholds, bucket splits and exclusions around the current
+    constants, using the cached stage 03, 04 and 08 artifacts. The full
+    reports, with per-address deltas, are written to `path`.
+    """
+    from scripts import snapshot
+
+    base = {
+        "totals": {
+            "points": int(snapshot.POINTS_TOTAL),
+            "staked": int(snapshot.STAKED_TOTAL),
+            "snapshot": int(snapshot.SNAPSHOT_TOTAL),
+        },
+        "dust": int(snapshot.DUST),
+        "excluded": sorted(snapshot.EXCLUDED),
+    }
+    staking = base["totals"]["points"] + base["totals"]["staked"]
+    splits = [
+        {
+            "points": staking * points // 100,
+            "staked": staking - staking * points // 100,
+            "snapshot": base["totals"]["snapshot"],
+        }
+        for points in [10, 15, 20, 25, 30]
+    ]
+    # NOTE: in hundredths of a token, 669 is 6.69 SPANK
+    dusts = [
+        hundredths * 10 ** 18 // 100
+        for hundredths in [0, 100, 300, 669, 1000, 2000, 5000]
+    ]
+    excluded = [base["excluded"]] + [
+        [user for user in base["excluded"] if user != included]
+        for included in base["excluded"]
+    ]
+    # NOTE: `brownie run sweep main 4` passes the worker count as a string
+    workers = int(workers) if workers else None
+    start = perf_counter()
+    reports = sweep(load_buckets(), grid(splits, dusts, excluded), base, workers)
+    elapsed = perf_counter() - start
+    for report in reports:
+        print(summary(report))
+    print(f"{len(reports)} scenarios in {elapsed:.2f}s")
+    json.dump(reports, open(path, "wt"), indent=2)
+    return reports
+
+
+def load_buckets(path="snapshot"):
+    path = Path(path)
+    return stage_buckets(
+        json.load((path / "03-spankpoints.json").open()),
+        json.load((path / "04-spankbank.json").open()),
+        json.load((path / "08-unwrapped.json").open()),
+    )
+
+
+def grid(totals, dusts, excluded):
+    return [
+        {"totals": split, "dust": dust, "excluded": exclude}
+        for split, dust, exclude in product(totals, dusts, excluded)
+    ]
+
+
+def sweep(buckets, scenarios, base, workers=None):
+    """
+    Evaluate each scenario, with the deltas of every address against `base`.
+    """
+    base_report = evaluate_with(buckets, base)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(
+            workers, initializer=set_buckets, initargs=(buckets,)
+        ) as pool:
+            reports = list(pool.map(evaluate, scenarios, chunksize=16))
+    else:
+        reports = [evaluate_with(buckets, scenario) for scenario in scenarios]
+    for report in reports:
+        report["deltas"] = deltas(
+            base_report["distribution"], report.pop("distribution")
+        )
+    return reports
+
+
+def set_buckets(buckets):
+    global BUCKETS
+    BUCKETS = buckets
+
+
+def evaluate(scenario):
+    return evaluate_with(BUCKETS, scenario)
+
+
+def evaluate_with(buckets, scenario):
+    distribution = buckets.distribute(
+        scenario["totals"], scenario["dust"], set(scenario["excluded"])
+    )
+    return {
+        "scenario": scenario,
+        "recipients": len(distribution),
+        "total": sum(distribution.values()),
+        "root": merkle_root(distribution),
+        "distribution": distribution,
+    }
+
+
+def merkle_root(distribution):
+    """
+    Root of the tree `prepare_merkle_tree` builds, without the proofs.
+    """
+    leaves = [
+        keccak(
+            index.to_bytes(32, "big")
+            + address_bytes(account)
+            + amount.to_bytes(32, "big")
+        )
+        for index, (account, amount) in enumerate(distribution.items())
+    ]
+    return encode_hex(build_layers(sorted(set(leaves)))[-1][0])
+
+
+@lru_cache(maxsize=None)
+def address_bytes(account):
+    return bytes.fromhex(account[2:])
+
+
+def deltas(before, after):
+    changed = {}
+    for user in before.keys() | after.keys():
+        delta = after.get(user, 0) - before.get(user, 0)
+        if delta:
+            changed[user] = delta
+    return changed
+
+
+def summary(report):
+    scenario = report["scenario"]
+    deltas = report["deltas"].values()
+    totals = " ".join(
+        f"{name}={total / 1e18:.0f}" for name, total in scenario["totals"].items()
+    )
+    return (
+        f"{totals} dust={scenario['dust'] / 1e18:.2f} "
+        f"excluded={len(scenario['excluded'])} "
+        f"recipients={report['recipients']} root={report['root'][:10]} "
+        f"changed={len(report['deltas'])} "
+        f"max_gain={max(deltas, default=0) / 1e18:.4f} "
+        f"max_loss={-min(deltas, default=0) / 1e18:.4f}"
+    )
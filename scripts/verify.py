@@ -0,0 +1,149 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from scripts.merkle import keccak
+
+DISTRIBUTION = "snapshot/10-merkle-distribution.json"
+BATCH_SIZE = 2 ** 14  # claims per worker task
+PARALLEL_THRESHOLD = 2 ** 16  # claims before a process pool pays off
+# NOTE: {root: {siblings left: {node: proof}}}, paths checked in this process
+VERIFIED = {}
+
+
+def main(path=DISTRIBUTION, workers=None):
+    """
+    Check every claim of a distribution file against its root, without a node.
+    """
+    distribution = json.load(open(path))
+    start = perf_counter()
+    report = verify(distribution, workers)
+    elapsed = perf_counter() - start
+    print(summary(report))
+    print(f"{report['claims']} claims verified in {elapsed:.2f}s")
+    assert report["ok"], "distribution failed verification"
+    return report
+
+
+def verify(distribution, workers=None, batch_size=BATCH_SIZE):
+    """
+    Verify the proof of every claim against `merkleRoot` and check the indices
+    and `tokenTotal`.
+
+    Returns a report with the accounts whose proof fails, indices claimed by
+    more than one account, indices missing from 0..n-1 and the two totals.
+    """
+    workers = workers or os.cpu_count()
+    root = bytes.fromhex(distribution["merkleRoot"][2:])
+    claims = [
+        (claim["index"], account, int(claim["amount"], 16), claim["proof"])
+        for account, claim in distribution["claims"].items()
+    ]
+    batches = [
+        (root, claims[i : i + batch_size]) for i in range(0, len(claims), batch_size)
+    ]
+    try:
+        if workers > 1 and len(claims) >= PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor(workers) as pool:
+                parts = list(pool.map(verify_batch, batches))
+        else:
+            parts = list(map(verify_batch, batches))
+    finally:
+        VERIFIED.pop(root, None)
+
+    owners = {}
+    collisions = {}
+    for index, account, _, _ in claims:
+        if index in owners:
+            collisions.setdefault(index, [owners[index]]).append(account)
+        else:
+            owners[index] = account
+    expected = int(distribution["tokenTotal"], 16)
+    actual = sum(amount for _, _, amount, _ in claims)
+    report = {
+        "claims": len(claims),
+        "invalid": [account for part in parts for account in part],
+        "collisions": dict(sorted(collisions.items())),
+        "missing": [index for index in range(len(claims)) if index not in owners],
+        "tokenTotal": {"expected": expected, "actual": actual},
+    }
+    report["ok"] = not (
+        report["invalid"]
+        or report["collisions"]
+        or report["missing"]
+        or expected != actual
+    )
+    return report
+
+
+def verify_batch(args):
+    """
+    Accounts in a batch of `(index, account, amount, proof)` claims whose proof
+    does not lead to `root`.
+    """
+    root, claims = args
+    verified = VERIFIED.setdefault(root, {})
+    return [
+        account
+        for index, account, amount, proof in claims
+        if not verify_proof(leaf_hash(index, account, amount), proof, root, verified)
+    ]
+
+
+def leaf_hash(index, account, amount):
+    """
+    keccak of `encode_abi_packed(["uint", "address", "uint"], ...)`, as the
+    distributor computes the node.
+    """
+    return keccak(
+        index.to_bytes(32, "big")
+        + bytes.fromhex(account[2:])
+        + amount.to_bytes(32, "big")
+    )
+
+
+def verify_proof(leaf, proof, root, verified=None):
+    """
+    `MerkleProof.verify`: hash each sibling in, smaller value first.
+
+    `verified` maps the number of siblings left above a node to the nodes
+    already checked to reach `root` with that many, and a proof through each.
+    A proof that arrives at such a node with exactly the same remaining
+    siblings is valid without hashing further, so checking a whole tree costs
+    about three hashes per claim instead of one per level.
+    """
+    verified = {} if verified is None else verified
+    node = leaf
+    path = []
+    for depth, sibling in enumerate(proof):
+        # NOTE: a node reached with fewer or more siblings left sits at another
+        # height, so only nodes memoized at this one can end the walk
+        known = verified.get(len(proof) - depth, {}).get(node)
+        if known is not None and known[depth - len(proof) :] == proof[depth:]:
+            break
+        path.append(node)
+        sibling = bytes.fromhex(sibling[2:])
+        node = keccak(node + sibling if node < sibling else sibling + node)
+    else:
+        if node != root:
+            return False
+    # NOTE: leaves are unique, only the nodes above them are worth keeping
+    for depth in range(1, len(path)):
+        verified.setdefault(len(proof) - depth, {})[path[depth]] = proof
+    return True
+
+
+def summary(report):
+    total = report["tokenTotal"]
+    lines = [
+        f"invalid proofs: {len(report['invalid'])}",
+        f"index collisions: {len(report['collisions'])}",
+        f"missing indices: {len(report['missing'])}",
+        f"tokenTotal: {total['expected']} expected, {total['actual']} in claims",
+    ]
+    for account in report["invalid"][:10]:
+        lines.append(f"  invalid proof for {account}")
+    for index, accounts in list(report["collisions"].items())[:10]:
+        lines.append(f"  index {index} claimed by {', '.join(accounts)}")
+    return "\n".join(lines)
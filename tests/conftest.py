@@ -1,6 +1,11 @@
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 
+from scripts.claims import ClaimsTable
+
 
 @pytest.fixture(autouse=True)
 def isolation_setup(fn_isolation):
@@ -28,9 +33,114 @@ def tree():
     return claim_data
 
 
+@pytest.fixture(scope="session")
+def claims():
+    return ClaimsTable.load("snapshot/10-merkle-distribution.json")
+
+
 @pytest.fixture(scope="module")
-def distributor(MerkleDistributor, multisig, tree, spank):
-    contract = MerkleDistributor.deploy(spank, tree["merkleRoot"], {"from": multisig})
-    spank.transfer(contract, tree["tokenTotal"], {"from": multisig})
+def distributor(MerkleDistributor, multisig, claims, spank):
+    contract = MerkleDistributor.deploy(spank, claims.root, {"from": multisig})
+    spank.transfer(contract, claims.total, {"from": multisig})
 
     return contract
+
+
+HEAD = 1000
+ZERO_HASH = "0x" + "00" * 32
+STORAGE = {}  # (address, slot): value served by the stand-in node
+
+
+def block_time(number):
+    return 1500000000 + 13 * number
+
+
+def handle(item):
+    method, params = item["method"], item["params"]
+    if method == "eth_blockNumber":
+        return hex(HEAD)
+    if method == "eth_getBlockByNumber":
+        number = int(params[0], 16)
+        return {
+            "number": hex(number),
+            "timestamp": hex(block_time(number)),
+            "hash": ZERO_HASH,
+        }
+    if method == "eth_getCode":
+        return "0x6000" if int(params[0], 16) % 2 else "0x"
+    if method == "eth_getStorageAt":
+        value = STORAGE.get((params[0].lower(), int(params[1], 16)), 0)
+        return "0x" + value.to_bytes(32, "big").hex()
+    if method == "eth_getLogs":
+        lo, hi = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+        if hi - lo >= 100:
+            raise ValueError("query returned more than 10000 results")
+        return [
+            {
+                "address": "0x" + "11" * 20,
+                "topics": [ZERO_HASH],
+                "data": "0x",
+                "blockNumber": hex(block),
+                "transactionHash": ZERO_HASH,
+                "transactionIndex": "0x0",
+                "blockHash": ZERO_HASH,
+                "logIndex": "0x0",
+                "removed": False,
+            }
+            for block in range(lo, hi + 1)
+            if block % 10 == 0
+        ]
+    raise ValueError(f"the method {method} does not exist")
+
+
+class Node(BaseHTTPRequestHandler):
+    """
+    Stand-in JSON-RPC node, failing the next `failures` requests with a 503.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.ports.add(self.client_address[1])
+            fail = server.failures > 0
+            server.failures -= fail
+        if fail:
+            return self.reply(503, b"")
+        items = payload if isinstance(payload, list) else [payload]
+        server.batches.append(len(items))
+        results = []
+        for item in items:
+            try:
+                results.append({"id": item["id"], "result": handle(item)})
+            except ValueError as e:
+                results.append(
+                    {"id": item["id"], "error": {"code": -32000, "message": str(e)}}
+                )
+        body = results if isinstance(payload, list) else results[0]
+        self.reply(200, json.dumps(body).encode())
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def node():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Node)
+    server.lock = threading.Lock()
+    server.ports = set()
+    server.batches = []
+    server.failures = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
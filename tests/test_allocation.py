@@ -0,0 +1,34 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+from scripts.allocation import allocate, allocate_to
+
+
+def test_exact_total():
+    rng = random.Random(3)
+    weights = [rng.randrange(10 ** 24) for _ in range(10000)]
+    total = 695060118 * 10 ** 15
+    shares = allocate(total, weights)
+    assert sum(shares) == total
+    for weight, share in zip(weights, shares):
+        exact = Fraction(total * weight, sum(weights))
+        assert share - 1 < exact < share + 1
+
+
+def test_largest_remainder():
+    # exact shares are 3.33, 3.33 and 3.33, the leftover unit goes to the first
+    assert allocate(10, [1, 1, 1]) == [4, 3, 3]
+    # exact shares are 1.4, 2.6 and 6.0
+    assert allocate(10, [7, 13, 30]) == [1, 3, 6]
+    assert allocate(10, [0, 1]) == [0, 10]
+
+
+def test_allocate_to():
+    assert allocate_to(100, {"a": 1, "b": 2, "c": 0}) == {"a": 33, "b": 67, "c": 0}
+
+
+def test_no_weights():
+    with pytest.raises(ValueError):
+        allocate(10, [0, 0])
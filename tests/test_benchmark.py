@@ -0,0 +1,87 @@
+import json
+from collections import Counter
+
+from scripts import benchmark, snapshot
+from scripts.decoder import EventDecoder
+from scripts.ledger import apply_transfer
+from scripts.spankbank import replay_stakers
+
+
+def test_synthetic_fixtures():
+    holders = benchmark.synthetic_holders(1000)
+    assert holders == benchmark.synthetic_holders(1000)
+    transfers = benchmark.synthetic_transfers(holders, start=100, end=200)
+    assert len(transfers) == 2000
+    assert all(100 <= transfer[0] < 200 for transfer in transfers)
+    balances = Counter()
+    for transfer in transfers:
+        apply_transfer(balances, *transfer)
+    assert sum(balances.values()) == sum(holders.values())
+
+
+def test_synthetic_chain():
+    chain = benchmark.synthetic_chain(1000, snapshot)
+    logs = chain["logs"][benchmark.SPANK]
+    blocks = [log["blockNumber"] for log in logs]
+    assert blocks == sorted(blocks)
+    assert snapshot.spank_deploy <= blocks[0] and blocks[-1] < snapshot.uni_deploy
+    assert chain["pools"] <= chain["contracts"]
+    assert chain["pools"] <= set(chain["logs"])
+
+    get_logs = benchmark.serve_logs(chain["logs"])
+    pools = sorted(chain["pools"])
+    found = get_logs({"address": pools}, 0, snapshot.uni_deploy)
+    assert len(found) == sum(len(chain["logs"][pool]) for pool in pools)
+    assert get_logs({"address": benchmark.SPANK}, blocks[0] + 1, blocks[-1]) == [
+        log for log in logs if blocks[0] < log["blockNumber"] <= blocks[-1]
+    ]
+
+
+def test_synthetic_staking():
+    logs, periods, points = benchmark.synthetic_staking(200)
+    abi = json.load(open("interfaces/SpankBank.json"))
+    events = EventDecoder(abi).decode_all(logs)
+    assert {event.event for event in events} >= {"StakeEvent", "CheckInEvent"}
+    staked = replay_stakers(events, periods)
+    assert list(staked) == list(periods)
+    assert any(info["stakers"] for info in staked.values())
+    assert all(stakers for stakers in points.values())
+
+
+def test_compare():
+    baseline = {
+        "fast": {"relative": 10, "peak_memory": 1000},
+        "lean": {"relative": 10, "peak_memory": 1000},
+        "gone": {"relative": 10, "peak_memory": 1000},
+    }
+    results = {
+        "fast": {"relative": 18, "peak_memory": 1200},
+        "lean": {"relative": 25, "peak_memory": 1300},
+    }
+    regressions = benchmark.compare(results, baseline, 10)
+    assert len(regressions) == 3
+    assert all(line.startswith("10 holders ") for line in regressions)
+    assert not any("fast" in line for line in regressions)
+
+
+def test_best_time_repeats_short_calls(monkeypatch):
+    monkeypatch.setattr(benchmark, "REPEAT", 2)
+    monkeypatch.setattr(benchmark, "MIN_TIME", 0.01)
+    calls = []
+    elapsed, result = benchmark.best_time(calls.append, 1)
+    assert len(calls) > 2
+    assert elapsed < 0.01 and result is None
+
+
+def test_run_stages(monkeypatch, tmp_path):
+    monkeypatch.setattr(benchmark, "BASELINES_DIR", str(tmp_path))
+    monkeypatch.setattr(benchmark, "REPEAT", 1)
+    monkeypatch.setattr(benchmark, "MIN_TIME", 0)
+    merkle_tree = snapshot.MERKLE_TREE
+    benchmark.stages(1000, save=True)
+    assert (tmp_path / "1000.json").exists()
+    results = json.load((tmp_path / "1000.json").open())
+    assert set(results) == set(snapshot.STAGES) - {"fetch_logs"} | {"verify"}
+    assert all(result["relative"] > 0 for result in results.values())
+    assert not list(tmp_path.glob("*.pickle"))
+    assert snapshot.MERKLE_TREE == merkle_tree
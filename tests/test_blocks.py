@@ -0,0 +1,65 @@
+import random
+from bisect import bisect_left
+
+import pytest
+
+from scripts import blocks
+
+HEAD = 200000
+
+
+class FakeEth:
+    def __init__(self):
+        rng = random.Random(7)
+        self.times = [1500000000]
+        for _ in range(HEAD):
+            self.times.append(self.times[-1] + rng.choice([1, 5, 13, 14, 15, 30, 60]))
+        self.blockNumber = HEAD
+        self.calls = 0
+
+    def getBlock(self, block):
+        self.calls += 1
+        return type("block", (), {"timestamp": self.times[block]})
+
+
+@pytest.fixture
+def eth(monkeypatch):
+    fake = FakeEth()
+    monkeypatch.setattr(blocks, "get_eth", lambda: fake)
+    return fake
+
+
+def first_block(eth, ts):
+    return bisect_left(eth.times, ts)
+
+
+def test_block_at(eth, tmp_path):
+    times = blocks.BlockTimes(tmp_path / "times.json")
+    for ts in [eth.times[0], eth.times[1], eth.times[5000] + 1, eth.times[150000]]:
+        assert blocks.block_at(ts, times) == first_block(eth, ts)
+
+
+def test_blocks_at_sorted(eth, tmp_path):
+    start, end = eth.times[1000], eth.times[HEAD - blocks.HEAD_OFFSET]
+    timestamps = list(range(start, end, (end - start) // 100))
+    random.Random(1).shuffle(timestamps)
+    times = blocks.BlockTimes(tmp_path / "times.json")
+    result = blocks.blocks_at(timestamps, times)
+    assert result == [first_block(eth, ts) for ts in timestamps]
+    # NOTE: a plain binary search takes ~18 fetches per timestamp
+    assert eth.calls < len(timestamps) * 6
+
+
+def test_cache_persists(eth, tmp_path):
+    ts = eth.times[123456] - 3
+    blocks.blocks_at([ts], blocks.BlockTimes(tmp_path / "times.json"))
+    calls = eth.calls
+    times = blocks.BlockTimes(tmp_path / "times.json")
+    assert blocks.blocks_at([ts], times) == [first_block(eth, ts)]
+    assert times.fetched == 0
+    assert eth.calls == calls
+
+
+def test_after_head(eth, tmp_path):
+    with pytest.raises(ValueError):
+        blocks.block_at(eth.times[-1], blocks.BlockTimes(tmp_path / "times.json"))
@@ -6,21 +6,19 @@ from hypothesis import assume
 @given(
     st_claim=strategy("decimal", min_value=0, max_value="0.9999", places=4),
 )
-def test_claim(distributor, tree, spank, st_claim, multisig):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+def test_claim(distributor, claims, spank, st_claim, multisig):
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
     initial_balance = spank.balanceOf(account)
     distributor.claim(
-        claim["index"],
+        index,
         account,
-        claim["amount"],
-        claim["proof"],
+        amount,
+        proof,
         {"from": account},
     )
 
-    assert spank.balanceOf(account) == initial_balance + claim["amount"]
+    assert spank.balanceOf(account) == initial_balance + amount
 
 
 @given(
@@ -28,40 +26,34 @@ def test_claim(distributor, tree, spank, st_claim, multisig):
     st_account=strategy("address"),
 )
 def test_claim_via_different_account(
-    distributor, tree, spank, multisig, st_claim, st_account
+    distributor, claims, spank, multisig, st_claim, st_account
 ):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
     assume(account != st_account)
     initial_balance = spank.balanceOf(account)
     distributor.claim(
-        claim["index"],
+        index,
         account,
-        claim["amount"],
-        claim["proof"],
+        amount,
+        proof,
         {"from": st_account},
     )
 
-    assert spank.balanceOf(account) == initial_balance + claim["amount"]
+    assert spank.balanceOf(account) == initial_balance + amount
 
 
 @given(st_claim=strategy("decimal", min_value=0, max_value="0.9999", places=4))
-def test_claim_twice(distributor, tree, spank, st_claim):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+def test_claim_twice(distributor, claims, spank, st_claim):
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
-    distributor.claim(
-        claim["index"], account, claim["amount"], claim["proof"], {"from": account}
-    )
+    distributor.claim(index, account, amount, proof, {"from": account})
 
     with brownie.reverts("MerkleDistributor: Drop already claimed."):
         distributor.claim(
-            claim["index"],
+            index,
             account,
-            claim["amount"],
-            claim["proof"],
+            amount,
+            proof,
             {"from": account},
         )
@@ -0,0 +1,78 @@
+from itertools import accumulate
+
+import pytest
+
+from scripts.claims import (
+    ClaimsTable,
+    claim_batches,
+    claim_many_args,
+    load_claim,
+    load_manifest,
+    write_claims,
+)
+
+
+def test_manifest(tree):
+    manifest = load_manifest()
+    assert manifest["merkleRoot"] == tree["merkleRoot"]
+    assert int(manifest["tokenTotal"], 16) == int(tree["tokenTotal"], 16)
+    assert manifest["claimCount"] == len(tree["claims"])
+
+
+def test_sharded_lookup(tree, tmp_path):
+    manifest = write_claims(tree, tmp_path)
+    for user, claim in tree["claims"].items():
+        assert load_claim(user.lower(), tmp_path, manifest) == claim
+
+
+def test_missing_claim(tmp_path, tree):
+    write_claims(tree, tmp_path)
+    assert load_claim("0x0000000000000000000000000000000000000001", tmp_path) is None
+
+
+def test_invalid_address(tmp_path, tree):
+    write_claims(tree, tmp_path)
+    user = next(iter(tree["claims"]))
+    # NOTE: swapping the case of one letter breaks the checksum
+    letter = next(n for n, char in enumerate(user) if char.isalpha() and n > 1)
+    bad_checksum = user[:letter] + user[letter].swapcase() + user[letter + 1 :]
+    for account in ["0x1234", "not an address", user + "00", bad_checksum]:
+        with pytest.raises(ValueError, match="not a valid address"):
+            load_claim(account, tmp_path)
+
+
+def test_claim_batches(tree):
+    claims = {
+        user: dict(claim, amount=hex(claim["amount"]))
+        for user, claim in tree["claims"].items()
+    }
+    claimed = set(range(0, len(claims), 7))
+    batches = claim_batches(claims, claimed, batch_size=64)
+    indices = [index for batch in batches for index, *_ in batch]
+    assert indices == sorted(set(range(len(claims))) - claimed)
+    assert all(len(batch) == 64 for batch in batches[:-1])
+    index, user, amount, proof = batches[0][0]
+    assert (amount, proof) == (tree["claims"][user]["amount"], claims[user]["proof"])
+
+
+def test_claims_table(tree, claims):
+    assert claims.root == tree["merkleRoot"]
+    assert len(claims) == len(tree["claims"])
+    for user, claim in tree["claims"].items():
+        assert claims[claim["index"]] == (
+            claim["index"],
+            user,
+            claim["amount"],
+            claim["proof"],
+        )
+
+
+def test_claim_many_args(claims):
+    batch = [claims[index] for index in range(5)]
+    indices, accounts, amounts, nodes, lengths = claim_many_args(batch)
+    assert indices == [index for index, _, _, _ in batch]
+    assert accounts == [account for _, account, _, _ in batch]
+    assert amounts == [amount for _, _, amount, _ in batch]
+    for (*_, proof), end, length in zip(batch, accumulate(lengths), lengths):
+        assert nodes[end - length : end] == proof
+    assert claim_many_args([]) == ([], [], [], [], [])
@@ -0,0 +1,85 @@
+import json
+
+from web3.datastructures import AttributeDict
+
+from scripts.columnar import load_columns, write_columns
+
+ABI = [
+    {
+        "type": "event",
+        "name": "Rebase",
+        "anonymous": False,
+        "inputs": [
+            {"name": "delta", "type": "int256", "indexed": False},
+            {"name": "tag", "type": "bytes32", "indexed": False},
+            {"name": "label", "type": "string", "indexed": False},
+            {"name": "topic", "type": "string", "indexed": True},
+        ],
+    }
+]
+
+
+def event(block, delta, tag, label):
+    return AttributeDict(
+        {
+            "args": AttributeDict(
+                {"delta": delta, "tag": tag, "label": label, "topic": bytes(32)}
+            ),
+            "event": "Rebase",
+            "logIndex": 0,
+            "transactionIndex": 0,
+            "transactionHash": bytes(32),
+            "address": "0x" + "aa" * 20,
+            "blockHash": bytes(32),
+            "blockNumber": block,
+        }
+    )
+
+
+def test_events_roundtrip(tmp_path):
+    events = list(load_columns("snapshot/02-events.columns"))
+    abi = json.load(open("interfaces/SpankBank.json"))
+    write_columns(events, tmp_path / "events", abi)
+    assert list(load_columns(tmp_path / "events")) == events
+
+
+def test_logs_roundtrip(tmp_path):
+    logs = list(load_columns("snapshot/01-logs.columns"))
+    write_columns(logs, tmp_path / "logs")
+    assert list(load_columns(tmp_path / "logs")) == logs
+
+
+def test_groupby_between():
+    events = load_columns("snapshot/02-events.columns")
+    start, end = 7000000, 8000000
+    expected = [
+        event
+        for event in events
+        if event.event == "CheckInEvent" and start <= event.blockNumber <= end
+    ]
+    assert list(events.groupby()["CheckInEvent"].between(start, end)) == expected
+    assert [event for event in events.between(start, end)] == [
+        event for event in events if start <= event.blockNumber <= end
+    ]
+
+
+def test_types_from_abi(tmp_path):
+    # NOTE: row 0 looks like a uint, an empty bytes32 and an address
+    address_like = "0x" + "12" * 20
+    events = [
+        event(1, 5, bytes(32), address_like),
+        event(2, -(2 ** 200), b"\x01" * 32, "spank"),
+    ]
+    write_columns(events, tmp_path / "events", ABI)
+    meta = json.load((tmp_path / "events" / "meta.json").open())
+    assert meta["tables"]["Rebase"]["args"] == {
+        "delta": "int256",
+        "tag": "bytes32",
+        "label": "string",
+        "topic": "bytes32",
+    }
+    rows = list(load_columns(tmp_path / "events"))
+    assert [row.args.delta for row in rows] == [5, -(2 ** 200)]
+    assert [row.args.tag for row in rows] == [bytes(32), b"\x01" * 32]
+    assert [row.args.label for row in rows] == [address_like, "spank"]
+    assert (tmp_path / "events" / "Rebase" / "arg.tag").stat().st_size == 64
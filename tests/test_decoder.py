@@ -0,0 +1,16 @@
+import json
+
+from scripts.columnar import load_columns
+from scripts.decoder import EventDecoder
+
+
+def load_abi(name):
+    with open(f"interfaces/{name}.json") as fp:
+        return json.load(fp)
+
+
+def test_decode_matches_events():
+    decoder = EventDecoder(load_abi("SpankBank"))
+    logs = load_columns("snapshot/01-logs.columns")
+    events = list(load_columns("snapshot/02-events.columns"))
+    assert decoder.decode_all(logs) == events
@@ -0,0 +1,74 @@
+import brownie
+
+from scripts.claims import claim_many_args
+
+BATCH_SIZES = [1, 10, 50, 100]
+SINGLE_CLAIMS = 20
+
+
+def test_claim_many(distributor, claims, spank, multisig):
+    batch = [claims[index] for index in range(50)]
+    balances = [spank.balanceOf(user) for _, user, _, _ in batch]
+    distributor.claimMany(*claim_many_args(batch), {"from": multisig})
+    for (index, user, amount, _), balance in zip(batch, balances):
+        assert distributor.isClaimed(index)
+        assert spank.balanceOf(user) == balance + amount
+
+
+def test_claim_many_twice(distributor, claims, multisig):
+    batch = [claims[index] for index in range(3)]
+    distributor.claim(*batch[1], {"from": multisig})
+    with brownie.reverts("MerkleDistributor: Drop already claimed."):
+        distributor.claimMany(*claim_many_args(batch), {"from": multisig})
+    with brownie.reverts("MerkleDistributor: Drop already claimed."):
+        distributor.claimMany(
+            *claim_many_args([batch[0], batch[0]]), {"from": multisig}
+        )
+
+
+def test_claim_many_invalid_proof(distributor, claims, multisig):
+    batch = [claims[index] for index in range(3)]
+    index, user, amount, proof = batch[2]
+    batch[2] = (index, user, amount + 1, proof)
+    with brownie.reverts("MerkleDistributor: Invalid proof."):
+        distributor.claimMany(*claim_many_args(batch), {"from": multisig})
+    assert not distributor.isClaimed(batch[0][0])
+
+
+def test_claim_many_length_mismatch(distributor, claims, multisig):
+    indices, accounts, amounts, proofs, lengths = claim_many_args(
+        [claims[index] for index in range(3)]
+    )
+    with brownie.reverts("MerkleDistributor: Length mismatch."):
+        distributor.claimMany(indices, accounts[:2], amounts, proofs, lengths)
+    with brownie.reverts("MerkleDistributor: Length mismatch."):
+        distributor.claimMany(indices, accounts, amounts, proofs + proofs[:1], lengths)
+    for last in [lengths[-1] + 1, 2 ** 256 - 1]:
+        with brownie.reverts("MerkleDistributor: Length mismatch."):
+            distributor.claimMany(
+                indices, accounts, amounts, proofs, lengths[:-1] + [last]
+            )
+
+
+def test_gas_per_claim(distributor, claims, multisig):
+    """
+    Gas per claim of single claims against claimMany batches of each size,
+    each on its own range of indices.
+    """
+    ordered = list(claims)
+    single = [
+        distributor.claim(*claim, {"from": multisig}).gas_used
+        for claim in ordered[:SINGLE_CLAIMS]
+    ]
+    per_claim = {"single": sum(single) / len(single)}
+    start = SINGLE_CLAIMS
+    for size in BATCH_SIZES:
+        args = claim_many_args(ordered[start : start + size])
+        tx = distributor.claimMany(*args, {"from": multisig})
+        per_claim[size] = tx.gas_used / size
+        start += size
+
+    for name, gas in per_claim.items():
+        print(f"{name:>8}: {gas:10,.0f} gas per claim")
+    assert per_claim[BATCH_SIZES[-1]] < per_claim["single"]
+    assert per_claim[BATCH_SIZES[-1]] < per_claim[BATCH_SIZES[0]]
@@ -5,17 +5,15 @@ from brownie.test import given, strategy
 @given(
     st_claim=strategy("decimal", min_value=0, max_value="0.9999", places=4),
 )
-def test_wrong_amount(distributor, multisig, tree, st_claim):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+def test_wrong_amount(distributor, multisig, claims, st_claim):
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
     with brownie.reverts("MerkleDistributor: Invalid proof."):
         distributor.claim(
-            claim["index"],
+            index,
             account,
-            claim["amount"] + 1,
-            claim["proof"],
+            amount + 1,
+            proof,
             {"from": multisig},
         )
 
@@ -23,17 +21,15 @@ def test_wrong_amount(distributor, multisig, tree, st_claim):
 @given(
     st_claim=strategy("decimal", min_value=0, max_value="0.9999", places=4),
 )
-def test_wrong_index(distributor, multisig, tree, st_claim):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+def test_wrong_index(distributor, multisig, claims, st_claim):
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
     with brownie.reverts("MerkleDistributor: Invalid proof."):
         distributor.claim(
-            claim["index"] + 1,
+            index + 1,
             account,
-            claim["amount"],
-            claim["proof"],
+            amount,
+            proof,
             {"from": multisig},
         )
 
@@ -42,16 +38,14 @@ def test_wrong_index(distributor, multisig, tree, st_claim):
     st_claim=strategy("decimal", min_value=0, max_value="0.9999", places=4),
     st_account=strategy("address"),
 )
-def test_wrong_address(distributor, multisig, tree, st_claim, st_account):
-    idx = int(st_claim * len(tree["claims"]))
-    account = sorted(tree["claims"])[idx]
-    claim = tree["claims"][account]
+def test_wrong_address(distributor, multisig, claims, st_claim, st_account):
+    index, account, amount, proof = claims[int(st_claim * len(claims))]
 
     with brownie.reverts("MerkleDistributor: Invalid proof."):
         distributor.claim(
-            claim["index"],
+            index,
             st_account,
-            claim["amount"],
-            claim["proof"],
+            amount,
+            proof,
             {"from": multisig},
         )
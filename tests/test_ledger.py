@@ -0,0 +1,140 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+from brownie.test import given, strategy
+from eth_utils import encode_hex, event_abi_to_log_topic, to_checksum_address
+from hexbytes import HexBytes
+
+from scripts import ledger
+from scripts.ledger import ZERO_ADDRESS, Ledger, apply_transfer, replay_transfers
+
+USERS = [ZERO_ADDRESS] + [f"0x{i:040x}" for i in range(1, 10)]
+TOKEN = "0x42d6622deCe394b54999Fbd73D108123806f6a18"
+DEPLOY_BLOCK = 100
+
+
+class Token:
+    abi = json.load(open("interfaces/ERC20.json"))
+
+    def __str__(self):
+        return TOKEN
+
+
+def transfer_log(n, block, src, dst, wad):
+    (abi,) = [item for item in Token.abi if item.get("name") == "Transfer"]
+    return {
+        "address": TOKEN,
+        "topics": [
+            HexBytes(event_abi_to_log_topic(abi)),
+            HexBytes(bytes.fromhex(src[2:]).rjust(32, b"\0")),
+            HexBytes(bytes.fromhex(dst[2:]).rjust(32, b"\0")),
+        ],
+        "data": encode_hex(wad.to_bytes(32, "big")),
+        "blockNumber": block,
+        "transactionHash": HexBytes(bytes(32)),
+        "transactionIndex": 0,
+        "blockHash": HexBytes(bytes(32)),
+        "logIndex": n,
+    }
+
+
+@pytest.fixture
+def transfers(monkeypatch, tmp_path):
+    """
+    Sorted (block, src, dst, wad) transfers, served as logs by a fake get_logs
+    that records the ranges scanned.
+    """
+    rng = random.Random(0)
+    users = [to_checksum_address(user) for user in USERS]
+    transfers = sorted(
+        (rng.randrange(DEPLOY_BLOCK, 300), rng.choice(users), rng.choice(users), n)
+        for n in range(1, 400)
+    )
+    logs = [transfer_log(n, *transfer) for n, transfer in enumerate(transfers)]
+    scans = []
+
+    def get_logs(params, start, end, checkpoint=None, **kwargs):
+        scans.append((start, end))
+        return [log for log in logs if start <= log["blockNumber"] <= end]
+
+    monkeypatch.setattr(ledger, "LEDGERS_DIR", str(tmp_path))
+    monkeypatch.setattr(ledger, "get_logs", get_logs)
+    return transfers, scans
+
+
+def replay(transfers, block):
+    balances = Counter()
+    for transfer in transfers:
+        if transfer[0] <= block:
+            apply_transfer(balances, *transfer)
+    return {user: balance for user, balance in balances.items() if balance}
+
+
+@given(
+    st_transfers=strategy("(uint8,uint8,uint8,uint16)[]", min_length=1, max_length=100),
+    st_blocks=strategy("uint8[]", min_length=1, max_length=10, unique=True),
+)
+def test_history_matches_full_scans(st_transfers, st_blocks):
+    transfers = sorted(
+        (block, USERS[src % 10], USERS[dst % 10], wad)
+        for block, src, dst, wad in st_transfers
+    )
+    blocks = sorted(st_blocks)
+    history = replay_transfers(Counter(), iter(transfers), blocks)
+
+    for block in blocks:
+        balances = Counter()
+        for transfer in transfers:
+            if transfer[0] <= block:
+                apply_transfer(balances, *transfer)
+        assert history.at(block) == {k: v for k, v in balances.items() if v}
+
+
+def test_history_only_stores_changes():
+    transfers = [
+        (1, ZERO_ADDRESS, USERS[1], 100),
+        (2, ZERO_ADDRESS, USERS[2], 100),
+        (5, USERS[1], USERS[2], 50),
+    ]
+    history = replay_transfers(Counter(), iter(transfers), [1, 3, 4, 6])
+    assert history.changes[3] == {USERS[2]: 100}
+    assert history.changes[4] == {}
+    assert history.at(6) == {USERS[1]: 50, USERS[2]: 150}
+
+
+def test_resumed_ledger_matches_full_replay(transfers):
+    transfers, scans = transfers
+    first = Ledger.load(Token(), DEPLOY_BLOCK, 150)
+    assert first.block == DEPLOY_BLOCK - 1
+    first.advance(150)
+
+    resumed = Ledger.load(Token(), DEPLOY_BLOCK, 250)
+    assert resumed.block == 150
+    resumed.advance(250)
+    assert scans == [(DEPLOY_BLOCK, 150), (151, 250)]
+    assert {k: v for k, v in resumed.balances.items() if v} == replay(transfers, 250)
+
+
+def test_load_latest_at_or_before(transfers):
+    for block in [120, 150, 190]:
+        Ledger.load(Token(), DEPLOY_BLOCK, block).advance(block)
+    assert Ledger.load(Token(), DEPLOY_BLOCK, 119).block == DEPLOY_BLOCK - 1
+    assert Ledger.load(Token(), DEPLOY_BLOCK, 150).block == 150
+    assert Ledger.load(Token(), DEPLOY_BLOCK, 189).block == 150
+    loaded = Ledger.load(Token(), DEPLOY_BLOCK, 1000)
+    assert loaded.block == 190
+    assert {k: v for k, v in loaded.balances.items() if v} == replay(transfers[0], 190)
+
+
+def test_load_rejects_other_deploy_block(transfers):
+    Ledger.load(Token(), DEPLOY_BLOCK, 150).advance(150)
+    with pytest.raises(AssertionError, match="another deploy block"):
+        Ledger.load(Token(), DEPLOY_BLOCK - 50, 200)
+
+
+def test_advance_only_forward(transfers):
+    saved = Ledger.load(Token(), DEPLOY_BLOCK, 150).advance(150)
+    with pytest.raises(AssertionError, match="only move forward"):
+        saved.advance(149)
@@ -0,0 +1,92 @@
+import pytest
+
+from scripts import logs
+
+LOG_LIMIT = 50
+BLOCK_LOGS = [{"blockNumber": b, "logIndex": 0} for b in range(0, 20000, 7)]
+
+
+class FakeEth:
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+        self.dropped = 0
+
+    def getLogs(self, params):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise KeyboardInterrupt
+        if self.dropped:
+            self.dropped -= 1
+            raise ConnectionError("connection refused")
+        result = [
+            log
+            for log in BLOCK_LOGS
+            if params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]
+        ]
+        if len(result) > LOG_LIMIT:
+            raise ValueError(
+                {"code": -32005, "message": "query returned more than 50 results"}
+            )
+        return result
+
+
+@pytest.fixture
+def eth(monkeypatch, tmp_path):
+    fake = FakeEth()
+    monkeypatch.setattr(logs, "CHECKPOINTS_DIR", tmp_path)
+    monkeypatch.setattr(logs, "get_eth", lambda: fake)
+    return fake
+
+
+def expected(start, end):
+    return [log for log in BLOCK_LOGS if start <= log["blockNumber"] <= end]
+
+
+def test_split_on_too_many_results(eth):
+    assert logs.get_logs({}, 100, 15000, step=5000) == expected(100, 15000)
+
+
+def test_resume_from_checkpoint(eth):
+    eth.fail_after = 3
+    with pytest.raises(KeyboardInterrupt):
+        logs.get_logs({}, 100, 15000, checkpoint="test", step=100, workers=1)
+    assert logs.Checkpoint("test", {}).ranges()
+
+    eth.fail_after = None
+    eth.calls = 0
+    assert logs.get_logs({}, 100, 15000, checkpoint="test", step=100) == expected(
+        100, 15000
+    )
+    assert logs.Checkpoint("test", {}).gaps(100, 15000) == []
+
+
+def test_extend_checkpoint(eth):
+    logs.get_logs({}, 100, 10000, checkpoint="test")
+    calls = eth.calls
+    assert logs.get_logs({}, 100, 15000, checkpoint="test") == expected(100, 15000)
+    assert logs.Checkpoint("test", {}).gaps(100, 15000) == []
+    assert eth.calls > calls
+
+
+def test_checkpoint_per_filter(eth):
+    logs.get_logs({"address": "0x" + "11" * 20}, 100, 10000, checkpoint="test")
+    calls = eth.calls
+    logs.get_logs({"address": "0x" + "22" * 20}, 100, 10000, checkpoint="test")
+    assert eth.calls > calls
+    calls = eth.calls
+    logs.get_logs({"address": "0x" + "11" * 20}, 100, 10000, checkpoint="test")
+    assert eth.calls == calls
+
+
+def test_connection_errors(eth, monkeypatch):
+    monkeypatch.setattr(logs, "BACKOFF", 0)
+    eth.dropped = logs.RETRIES
+    assert logs.get_logs({}, 100, 300, workers=1) == expected(100, 300)
+    assert eth.calls == logs.RETRIES + 1
+
+    eth.dropped = logs.RETRIES + 1
+    eth.calls = 0
+    with pytest.raises(ConnectionError):
+        logs.get_logs({}, 100, 300, workers=1)
+    assert eth.calls == logs.RETRIES + 1
@@ -0,0 +1,82 @@
+from brownie.test import given, strategy
+from eth_abi.packed import encode_abi_packed
+from eth_utils import decode_hex, encode_hex
+
+from scripts import merkle
+from scripts.benchmark import legacy_layers
+from scripts.merkle import MerkleTree, keccak
+from scripts.verify import verify_proof
+
+
+def tree_nodes(tree):
+    return [
+        encode_hex(
+            encode_abi_packed(
+                ["uint", "address", "uint"], (claim["index"], user, claim["amount"])
+            )
+        )
+        for user, claim in sorted(tree["claims"].items(), key=lambda x: x[1]["index"])
+    ]
+
+
+def test_rebuild_root(tree):
+    merkle_tree = MerkleTree(tree_nodes(tree))
+    assert encode_hex(merkle_tree.root) == tree["merkleRoot"]
+
+
+def test_all_proofs_match_claims(tree):
+    merkle_tree = MerkleTree(tree_nodes(tree))
+    proofs = merkle_tree.get_all_proofs()
+    for claim in tree["claims"].values():
+        assert proofs[claim["index"]] == claim["proof"]
+
+
+@given(st_size=strategy("uint", min_value=1, max_value=300))
+def test_all_proofs_match_get_proof(st_size):
+    nodes = [encode_hex(i.to_bytes(32, "big")) for i in range(st_size)]
+    merkle_tree = MerkleTree(nodes)
+    assert merkle_tree.get_all_proofs() == [
+        merkle_tree.get_proof(node) for node in nodes
+    ]
+
+
+@given(st_size=strategy("uint", min_value=1, max_value=300))
+def test_batched_layers_match_combined_hash(st_size):
+    nodes = [encode_hex(i.to_bytes(32, "big")) for i in range(st_size)]
+    merkle_tree = MerkleTree(nodes)
+    assert merkle_tree.layers == legacy_layers(merkle_tree.elements)
+
+
+def test_parallel_layers(monkeypatch):
+    monkeypatch.setattr(merkle, "PARALLEL_THRESHOLD", 64)
+    monkeypatch.setattr(merkle, "BATCH_SIZE", 16)
+    nodes = [encode_hex(i.to_bytes(32, "big")) for i in range(1001)]
+    parallel = MerkleTree(nodes, workers=2)
+    assert parallel.layers == MerkleTree(nodes, workers=1).layers
+    assert parallel.layers == legacy_layers(parallel.elements)
+
+
+def test_update_in_place():
+    nodes = [encode_hex(i.to_bytes(32, "big")) for i in range(301)]
+    merkle_tree = MerkleTree(nodes)
+    replaced = {
+        nodes[i]: encode_hex((1000 + i).to_bytes(32, "big")) for i in [0, 7, 300]
+    }
+    added = [encode_hex((2000 + i).to_bytes(32, "big")) for i in range(5)]
+    changed = merkle_tree.update(replaced, added)
+    assert merkle_tree.layers == legacy_layers(merkle_tree.elements)
+    assert sum(len(positions) for positions in changed) < 60
+
+    current = [replaced.get(node, node) for node in nodes] + added
+    proofs = merkle_tree.get_all_proofs()
+    for node, proof in zip(current, proofs):
+        assert verify_proof(keccak(decode_hex(node)), proof, merkle_tree.root)
+        assert proof == merkle_tree.get_proof(node)
+
+
+def test_changed_claims():
+    nodes = [encode_hex(i.to_bytes(32, "big")) for i in range(16)]
+    merkle_tree = MerkleTree(nodes)
+    assert merkle_tree.changed_claims(merkle_tree.update({})) == []
+    changed = merkle_tree.update({nodes[3]: encode_hex(b"\x01" * 32)})
+    assert merkle_tree.changed_claims(changed) == list(range(16))
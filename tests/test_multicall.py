@@ -0,0 +1,70 @@
+import pytest
+
+from scripts import multicall
+from scripts.rpc import RPCError
+
+
+class FakeFn:
+    abi = {"outputs": [{"type": "uint256"}]}
+
+    def encode_input(self, value):
+        return value
+
+    def decode_output(self, data):
+        return data * 2
+
+
+class FakeAggregate:
+    def __init__(self):
+        self.batches = []
+
+    def call(self, calls, block_identifier=None):
+        self.batches.append(len(calls))
+        if any(data == "node" for _, data in calls):
+            raise RPCError({"code": -32000, "message": "header not found"})
+        if any(data == "gas" for _, data in calls):
+            raise ValueError({"code": -32000, "message": "out of gas"})
+        if any(data < 0 for _, data in calls):
+            raise ValueError("execution reverted: Multicall aggregate: call failed")
+        return block_identifier, [data for _, data in calls]
+
+
+@pytest.fixture
+def aggregate(monkeypatch):
+    fake = FakeAggregate()
+    monkeypatch.setattr(multicall, "MAX_CALLS", 16)
+    monkeypatch.setattr(multicall, "MULTICALL_DEPLOY", 0)
+    monkeypatch.setattr(
+        multicall, "get_multicall", lambda: type("multicall", (), {"aggregate": fake})
+    )
+    return fake
+
+
+def test_chunks(aggregate):
+    calls = [("0x", FakeFn(), i) for i in range(100)]
+    assert multicall.batch_call(calls, 1) == [i * 2 for i in range(100)]
+    assert max(aggregate.batches) == 16
+
+
+def test_bisect_failing_calls(aggregate):
+    values = [1, 2, -1, 4, 5, -6, 7]
+    calls = [("0x", FakeFn(), value) for value in values]
+    assert multicall.batch_call(calls, 1) == [2, 4, None, 8, 10, None, 14]
+
+
+def test_blocks(aggregate):
+    calls = [("0x", FakeFn(), i) for i in range(40)]
+    results = multicall.batch_call_blocks(calls, [1, 2, 3])
+    assert results == {block: [i * 2 for i in range(40)] for block in [1, 2, 3]}
+
+
+def test_bisect_out_of_gas(aggregate):
+    calls = [("0x", FakeFn(), value) for value in [1, "gas", 3]]
+    assert multicall.batch_call(calls, 1) == [2, None, 6]
+
+
+def test_node_errors_raise(aggregate):
+    calls = [("0x", FakeFn(), value) for value in [1, 2, "node", 4]]
+    with pytest.raises(RPCError, match="header not found"):
+        multicall.batch_call(calls, 1)
+    assert aggregate.batches == [4]
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from scripts import profiling, rpc
+from scripts.profiling import count_cache_hit, profile, stage
+
+
+@pytest.fixture
+def client(node):
+    client = rpc.Client(f"http://127.0.0.1:{node.server_port}", backoff=0.01)
+    yield client
+    client.close()
+
+
+def test_profile(node, client, tmp_path):
+    path = tmp_path / "profile.json"
+    with profile("test", path):
+        with stage("blocks"):
+            node.failures = 2
+            client.blockNumber
+            client.batch([("eth_getCode", [f"0x{i:040x}", "0x1"]) for i in range(10)])
+            count_cache_hit("block_times", 3)
+        with stage("logs"):
+            with stage("inner"):
+                client.getBlock(1)
+            client.blockNumber
+        count_cache_hit("code", 0)
+    assert profiling.ACTIVE is None
+    report = json.load(path.open())
+    stages = report["stages"]
+    assert set(stages) == {"blocks", "logs", "inner"}
+    assert stages["blocks"]["rpc"] == {"eth_blockNumber": 1, "eth_getCode": 10}
+    assert stages["blocks"]["retries"] == 2
+    assert stages["blocks"]["cache_hits"] == {"block_times": 3}
+    assert stages["blocks"]["bytes_received"] > stages["logs"]["bytes_received"] > 0
+    assert stages["inner"]["rpc"] == {"eth_getBlockByNumber": 1}
+    assert stages["logs"]["rpc"] == {"eth_blockNumber": 1}
+    assert report["rpc"] == {
+        "eth_blockNumber": 2,
+        "eth_getCode": 10,
+        "eth_getBlockByNumber": 1,
+    }
+    assert report["cache_hits"] == {"block_times": 3}
+    assert report["peak_rss"] > 0
+
+
+def test_inactive(client):
+    with stage("anything"):
+        client.blockNumber
+        count_cache_hit("code")
+    assert profiling.ACTIVE is None
+
+
+@pytest.mark.skipif(
+    not profiling.reset_peak_rss(), reason="needs /proc/self/clear_refs"
+)
+def test_peak_rss_per_stage(tmp_path):
+    path = tmp_path / "profile.json"
+    size = 200 * 2 ** 20
+    with profile("test", path):
+        with stage("heavy"):
+            block = bytearray(size)
+            del block
+        with stage("light"):
+            pass
+        with stage("outer"):
+            with stage("inner"):
+                block = bytearray(size)
+                del block
+    report = json.load(path.open())
+    stages = report["stages"]
+    assert stages["heavy"]["peak_rss"] - stages["light"]["peak_rss"] > size // 2
+    assert stages["outer"]["peak_rss"] >= stages["inner"]["peak_rss"]
+    assert stages["inner"]["peak_rss"] - stages["light"]["peak_rss"] > size // 2
+    assert report["peak_rss"] >= stages["heavy"]["peak_rss"]
@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import HEAD, block_time
+from scripts import logs, recording, rpc
+
+SPANK = "0x" + "11" * 20
+
+
+@pytest.fixture
+def store(tmp_path):
+    return tmp_path / "recording"
+
+
+def scan(monkeypatch, tmp_path, client, step):
+    monkeypatch.setattr(logs, "CHECKPOINTS_DIR", tmp_path / f"checkpoints-{step}")
+    monkeypatch.setattr(logs, "get_eth", lambda: client)
+    return logs.get_logs({"address": SPANK}, 0, 999, step=step)
+
+
+def test_store_roundtrip(store):
+    record = recording.Recording(store, "w")
+    record.record("eth_blockNumber", [], hex(HEAD))
+    record.record("eth_call", [{"to": SPANK}, "0x1"], error={"message": "reverted"})
+    record.close()
+    replay = recording.Recording(store)
+    assert len(replay) == 2
+    assert replay.replay("eth_blockNumber", []) == {"result": hex(HEAD)}
+    assert replay.replay("eth_call", [{"to": SPANK}, "0x1"]) == {
+        "error": {"message": "reverted"}
+    }
+    with pytest.raises(recording.NotRecorded):
+        replay.replay("eth_call", [{"to": SPANK}, "0x2"])
+
+
+def test_replay_client(node, store, monkeypatch, tmp_path):
+    url = f"http://127.0.0.1:{node.server_port}"
+    record = recording.Recording(store, "w")
+    client = recording.RecordingClient(url, record)
+    blocks = [client.getBlock(n) for n in range(5)]
+    codes = client.batch([("eth_getCode", [f"0x{i:040x}", "0x1"]) for i in range(10)])
+    found = scan(monkeypatch, tmp_path, client, 500)
+    with pytest.raises(rpc.RPCError):
+        client.request("eth_foo", [])
+    client.close()
+    record.close()
+    node.shutdown()
+
+    replay = recording.ReplayClient(recording.Recording(store))
+    assert [replay.getBlock(n) for n in range(5)] == blocks
+    assert [block.timestamp for block in blocks] == [block_time(n) for n in range(5)]
+    assert (
+        replay.batch([("eth_getCode", [f"0x{i:040x}", "0x1"]) for i in range(10)])
+        == codes
+    )
+    with pytest.raises(rpc.RPCError):
+        replay.request("eth_foo", [])
+    # NOTE: ranges split differently from the recorded ones still replay
+    assert scan(monkeypatch, tmp_path, replay, 30) == found
+    with pytest.raises(recording.NotRecorded):
+        replay.getLogs({"address": SPANK, "fromBlock": 900, "toBlock": 1100})
+
+
+class FakeProvider:
+    endpoint_uri = "http://node"
+
+    def make_request(self, method, params):
+        if method == "eth_call":
+            return {"jsonrpc": "2.0", "id": 1, "error": {"message": "reverted"}}
+        return {"jsonrpc": "2.0", "id": 1, "result": hex(HEAD)}
+
+    def isConnected(self):
+        return True
+
+
+def test_providers(store):
+    record = recording.Recording(store, "w")
+    provider = recording.RecordingProvider(FakeProvider(), record)
+    expected = [
+        provider.make_request("eth_blockNumber", []),
+        provider.make_request("eth_call", [{"to": SPANK}, "latest"]),
+    ]
+    record.close()
+    replay = recording.ReplayProvider(recording.Recording(store))
+    assert [
+        replay.make_request("eth_blockNumber", []),
+        replay.make_request("eth_call", [{"to": SPANK}, "latest"]),
+    ] == [dict(response, id=0) for response in expected]
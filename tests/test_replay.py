@@ -0,0 +1,58 @@
+from time import perf_counter
+
+from scripts.claims import CLAIM_BATCH, claim_many_args
+from scripts.multicall import batch_call
+from scripts.status import WORD_BITS, claimed_indices, read_bitmap
+
+
+def replay(distributor, claims, sender, batch_size=None):
+    """
+    Claim every index, one transaction each or in `claimMany` batches.
+    Returns the runtime and the total gas used.
+    """
+    start = perf_counter()
+    gas = 0
+    if batch_size:
+        for first in range(0, len(claims), batch_size):
+            last = min(first + batch_size, len(claims))
+            batch = [claims[index] for index in range(first, last)]
+            tx = distributor.claimMany(*claim_many_args(batch), {"from": sender})
+            gas += tx.gas_used
+    else:
+        for claim in claims:
+            gas += distributor.claim(*claim, {"from": sender}).gas_used
+    return perf_counter() - start, gas
+
+
+def test_replay_every_claim(distributor, claims, spank, multisig, chain):
+    """
+    Claim the whole drop, singly and then batched from the same chain snapshot,
+    and check every balance and bitmap bit. Prints the runtime and gas of each
+    mode and the total.
+    """
+    calls = [(spank, spank.balanceOf, account) for _, account, _, _ in claims]
+    before = batch_call(calls)
+    chain.snapshot()
+    report = {}
+    for batch_size in [None, CLAIM_BATCH]:
+        seconds, gas = replay(distributor, claims, multisig, batch_size)
+        after = batch_call(calls)
+        for (_, account, amount, _), old, new in zip(claims, before, after):
+            assert new[0] - old[0] == amount, account
+        assert spank.balanceOf(distributor) == 0
+        words = read_bitmap(str(distributor), (len(claims) - 1) // WORD_BITS + 1)
+        assert claimed_indices(words) == set(range(len(claims)))
+
+        mode = f"batches of {batch_size}" if batch_size else "single claims"
+        report[mode] = seconds, gas
+        chain.revert()
+
+    for mode, (seconds, gas) in report.items():
+        print(
+            f"{mode}: {len(claims)} claims in {seconds:.1f}s, "
+            f"{gas:,} gas, {gas / len(claims):,.0f} per claim"
+        )
+    seconds, gas = map(sum, zip(*report.values()))
+    print(f"total: {seconds:.1f}s, {gas:,} gas")
+    single, batched = [gas for _, gas in report.values()]
+    assert batched < single
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import HEAD, block_time
+from scripts import logs, rpc
+
+
+@pytest.fixture
+def client(node):
+    client = rpc.Client(f"http://127.0.0.1:{node.server_port}", backoff=0.01)
+    yield client
+    client.close()
+
+
+def test_batch(node, client):
+    addresses = [f"0x{i:040x}" for i in range(250)]
+    codes = client.batch([("eth_getCode", [address, "0x1"]) for address in addresses])
+    assert codes == ["0x6000" if i % 2 else "0x" for i in range(250)]
+    assert sorted(node.batches) == [50, 100, 100]
+
+
+def test_request_batch(node, client, monkeypatch):
+    monkeypatch.setattr(rpc, "get_eth", lambda: client)
+    assert rpc.request_batch([("eth_blockNumber", [])] * 3) == [hex(HEAD)] * 3
+    assert node.batches == [3]
+
+
+def test_request_batch_without_http(monkeypatch):
+    requests = []
+
+    def make_request(method, params):
+        requests.append(method)
+        if method == "eth_foo":
+            return {"error": {"code": -32601, "message": "no such method"}}
+        return {"result": "0x6000"}
+
+    # NOTE: an ipc or websocket provider has no http endpoint to batch over
+    provider = SimpleNamespace(make_request=make_request)
+    monkeypatch.setattr(rpc, "web3", SimpleNamespace(provider=provider, eth=None))
+    calls = [("eth_getCode", ["0x" + "11" * 20, "latest"])] * 2
+    assert rpc.request_batch(calls) == ["0x6000", "0x6000"]
+    assert requests == ["eth_getCode", "eth_getCode"]
+    with pytest.raises(rpc.RPCError):
+        rpc.request_batch([("eth_foo", [])])
+
+
+def test_errors(client):
+    with pytest.raises(rpc.RPCError):
+        client.request("eth_foo", [])
+    results = client.batch(
+        [("eth_blockNumber", []), ("eth_foo", [])], return_exceptions=True
+    )
+    assert results[0] == hex(HEAD)
+    assert isinstance(results[1], rpc.RPCError)
+
+
+def test_retry(node, client):
+    node.failures = 3
+    assert client.blockNumber == HEAD
+    assert client.client.retried == 3
+
+
+def test_retries_exhausted(node, client):
+    node.failures = rpc.RETRIES + 1
+    with pytest.raises(Exception):
+        client.request("eth_blockNumber", [])
+
+
+def test_pool(node):
+    client = rpc.Client(f"http://127.0.0.1:{node.server_port}", concurrency=4)
+    with ThreadPoolExecutor(16) as pool:
+        blocks = list(pool.map(client.getBlock, range(200)))
+    client.close()
+    assert [block.timestamp for block in blocks] == [block_time(n) for n in range(200)]
+    assert len(node.ports) <= 4
+
+
+def test_get_logs(monkeypatch, tmp_path, client):
+    monkeypatch.setattr(logs, "CHECKPOINTS_DIR", tmp_path)
+    monkeypatch.setattr(logs, "get_eth", lambda: client)
+    result = logs.get_logs({"address": "0x" + "11" * 20}, 0, 999, step=500)
+    assert [log.blockNumber for log in result] == list(range(0, 1000, 10))
+    assert result[0].address == "0x" + "11" * 20
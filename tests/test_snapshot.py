@@ -0,0 +1,87 @@
+import inspect
+import json
+
+import pytest
+
+from scripts import snapshot
+from scripts.blocks import BlockTimes, blocks_at
+from scripts.contracts import code_sizes, find_pairs
+from scripts.decoder import EventDecoder
+from scripts.ledger import Ledger
+from scripts.logs import get_logs
+from scripts.spankbank import replay_stakers
+
+
+@pytest.mark.parametrize(
+    "name,helpers",
+    [
+        ("calc_uniswap", [find_pairs, snapshot.transfers_to_balances_many]),
+        ("find_contracts", [code_sizes]),
+        ("calc_spank", [Ledger, get_logs, EventDecoder]),
+        ("calc_spankbank_spank", [BlockTimes, blocks_at, replay_stakers]),
+    ],
+)
+def test_stage_helpers(name, helpers):
+    found = snapshot.stage_helpers(snapshot.STAGES[name]["func"])
+    for helper in helpers:
+        assert helper in found
+
+
+def test_helper_change_changes_key(monkeypatch):
+    before = {name: snapshot.stage_key(name) for name in snapshot.STAGES}
+    getsource = inspect.getsource
+
+    def edited(obj):
+        source = getsource(obj)
+        return source + "# edited\n" if obj is code_sizes else source
+
+    monkeypatch.setattr(inspect, "getsource", edited)
+    after = {name: snapshot.stage_key(name) for name in snapshot.STAGES}
+    changed = {name for name in snapshot.STAGES if before[name] != after[name]}
+    # NOTE: find_contracts calls code_sizes, the rest changed through deps
+    assert "find_contracts" in changed
+    assert {"calc_uniswap", "unwrap_balances", "prepare_merkle_tree"} <= changed
+    assert "fetch_logs" not in changed
+    assert "calc_spank" not in changed
+
+
+def test_unrecorded_artifact_rebuilds(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot, "STAGES", {})
+    monkeypatch.setattr(snapshot, "STAGES_MANIFEST", tmp_path / "stages.json")
+    path = tmp_path / "stage.json"
+    json.dump("old", path.open("wt"))
+    calls = []
+
+    @snapshot.cached(str(path))
+    def fresh():
+        calls.append(1)
+        return "new"
+
+    assert fresh() == "new"
+    assert fresh() == "new"
+    assert len(calls) == 1
+
+    json.dump("old", path.open("wt"))
+    snapshot.STAGES_MANIFEST.unlink()
+    snapshot.adopt()
+    assert fresh() == "old"
+    assert len(calls) == 1
+
+
+def test_merkle_checkpoint_only_when_incremental(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot, "MERKLE_TREE", str(tmp_path / "tree.pickle"))
+    monkeypatch.setattr(snapshot, "CHANGED_CLAIMS", str(tmp_path / "changed.json"))
+    stage = snapshot.STAGES["prepare_merkle_tree"]
+    monkeypatch.setitem(stage, "path", str(tmp_path / "distribution.json"))
+    balances = {f"0x{i:040x}": 10 ** 18 * i for i in range(1, 20)}
+    distribution = stage["func"](dict(balances))
+    assert not (tmp_path / "tree.pickle").exists()
+
+    json.dump(distribution, (tmp_path / "distribution.json").open("wt"))
+    monkeypatch.setattr(snapshot, "INCREMENTAL", True)
+    balances[f"0x{5:040x}"] += 1
+    patched = stage["func"](dict(balances))
+    assert (tmp_path / "tree.pickle").exists()
+    assert patched["merkleRoot"] != distribution["merkleRoot"]
+    for user, claim in distribution["claims"].items():
+        assert patched["claims"][user]["index"] == claim["index"]
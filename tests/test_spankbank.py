@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from scripts.columnar import load_columns
+from scripts.multicall import MULTICALL_DEPLOY
+from scripts.spankbank import period_end_times, replay_stakers
+
+
+@pytest.fixture(scope="module")
+def events():
+    return load_columns("snapshot/02-events.columns")
+
+
+@pytest.fixture(scope="module")
+def staked():
+    with open("snapshot/04-spankbank.json") as fp:
+        return {int(period): info for period, info in json.load(fp).items()}
+
+
+def test_replay_matches_snapshot(events, staked):
+    replayed = replay_stakers(events, staked, window_until=MULTICALL_DEPLOY)
+    assert json.loads(json.dumps(replayed)) == {str(k): v for k, v in staked.items()}
+
+
+def test_period_end_times(events, staked):
+    deploy_timestamp = staked[1]["end_time"] - 2 * 2592069
+    end_times = period_end_times(
+        events, deploy_timestamp, staked[max(staked)]["end_time"]
+    )
+    assert end_times == {period: info["end_time"] for period, info in staked.items()}
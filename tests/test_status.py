@@ -0,0 +1,92 @@
+import pytest
+from eth_utils import encode_hex, event_abi_to_log_topic
+from hexbytes import HexBytes
+
+from conftest import STORAGE, ZERO_HASH
+from scripts import rpc, status
+
+DISTRIBUTOR = "0x" + "22" * 20
+ACCOUNT = "0x" + "33" * 20
+
+
+@pytest.fixture
+def client(node, monkeypatch):
+    client = rpc.Client(f"http://127.0.0.1:{node.server_port}")
+    monkeypatch.setattr(status, "request_batch", client.batch)
+    yield client
+    client.close()
+
+
+def claimed_log(block, index, amount):
+    data = index.to_bytes(32, "big") + bytes(12) + bytes.fromhex(ACCOUNT[2:])
+    return {
+        "address": DISTRIBUTOR,
+        "topics": [HexBytes(event_abi_to_log_topic(status.CLAIMED_ABI))],
+        "data": encode_hex(data + amount.to_bytes(32, "big")),
+        "blockNumber": block,
+        "transactionHash": HexBytes(ZERO_HASH),
+        "transactionIndex": 0,
+        "blockHash": HexBytes(ZERO_HASH),
+        "logIndex": 0,
+    }
+
+
+def test_claimed_indices():
+    words = [0b1011, 0, 1 << 255]
+    assert status.claimed_indices(words) == {0, 1, 3, 767}
+
+
+def test_read_bitmap(node, client, monkeypatch):
+    monkeypatch.setitem(STORAGE, (DISTRIBUTOR, status.bitmap_slot(1)), 1 << 5)
+    monkeypatch.setitem(STORAGE, (DISTRIBUTOR, status.bitmap_slot(3)), 3)
+    words = status.read_bitmap(DISTRIBUTOR, 4, 100)
+    assert status.claimed_indices(words) == {261, 768, 769}
+    assert node.batches == [4]
+
+
+def test_claim_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(status, "STATUS_DIR", str(tmp_path))
+    logs = [claimed_log(15, 3, 100), claimed_log(150, 7, 200)]
+    scans = []
+
+    def get_logs(params, start, end):
+        scans.append((start, end))
+        return [log for log in logs if start <= log["blockNumber"] <= end]
+
+    monkeypatch.setattr(status, "get_logs", get_logs)
+    status.ClaimIndex(DISTRIBUTOR, 10).update(100)
+    index = status.ClaimIndex.load(DISTRIBUTOR, 10)
+    assert index.block == 100
+    assert list(index.claimed) == [3]
+    index.update(200)
+    assert scans == [(10, 100), (101, 200)]
+    index = status.ClaimIndex.load(DISTRIBUTOR, 10)
+    assert index.claimed[7]["amount"] == 200
+    assert index.claimed[7]["account"].lower() == ACCOUNT
+
+
+def test_claim_report(tree):
+    distribution = {
+        "claims": {
+            user: dict(claim, amount=hex(claim["amount"]))
+            for user, claim in tree["claims"].items()
+        }
+    }
+    claimed = set(range(0, len(tree["claims"]), 3))
+    report = status.claim_report(distribution, claimed)
+    assert len(report["claimed"]) == len(claimed)
+    assert report["claimed_total"] + report["unclaimed_total"] == int(
+        tree["tokenTotal"], 16
+    )
+    assert status.word_count(distribution) == (len(tree["claims"]) - 1) // 256 + 1
+
+
+def test_bitmap_slot_layout(distributor, claims, multisig, web3):
+    index, account, amount, proof = claims[300]
+    distributor.claim(index, account, amount, proof, {"from": multisig})
+    word = web3.eth.getStorageAt(
+        str(distributor), status.bitmap_slot(index // status.WORD_BITS)
+    )
+    assert status.claimed_indices([int.from_bytes(word, "big")]) == {
+        index % status.WORD_BITS
+    }
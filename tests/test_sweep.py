@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from scripts import sweep
+from scripts.snapshot import DUST, EXCLUDED, POINTS_TOTAL, SNAPSHOT_TOTAL, STAKED_TOTAL
+
+TOTALS = {
+    "points": int(POINTS_TOTAL),
+    "staked": int(STAKED_TOTAL),
+    "snapshot": int(SNAPSHOT_TOTAL),
+}
+
+
+@pytest.fixture(scope="module")
+def buckets():
+    return sweep.load_buckets()
+
+
+@pytest.fixture(scope="module")
+def base():
+    return {"totals": TOTALS, "dust": int(DUST), "excluded": sorted(EXCLUDED)}
+
+
+def test_matches_artifacts(buckets, base):
+    report = sweep.evaluate_with(buckets, base)
+    with open("snapshot/10-merkle-distribution.json") as fp:
+        tree = json.load(fp)
+    assert report["root"] == tree["merkleRoot"]
+    assert report["total"] == int(tree["tokenTotal"], 16)
+    assert report["recipients"] == len(tree["claims"])
+
+
+def test_sweep(buckets, base):
+    dusts = [0, base["dust"], 10 * base["dust"]]
+    scenarios = sweep.grid([TOTALS], dusts, [base["excluded"], []])
+    reports = sweep.sweep(buckets, scenarios, base)
+    assert [report["total"] for report in reports] == [sum(TOTALS.values())] * 6
+    recipients = [report["recipients"] for report in reports[::2]]
+    assert recipients == sorted(recipients, reverse=True)
+    assert reports[2]["deltas"] == {}
+    assert sum(reports[4]["deltas"].values()) == 0
+    assert reports == sweep.sweep(buckets, scenarios, base, workers=2)
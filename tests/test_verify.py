@@ -0,0 +1,91 @@
+import copy
+
+from eth_abi.packed import encode_abi_packed
+from eth_utils import encode_hex
+
+from scripts import verify
+from scripts.merkle import keccak
+
+
+def distribution(tree):
+    # NOTE: the fixture decodes amounts, the verifier reads the file format
+    data = copy.deepcopy(tree)
+    for claim in data["claims"].values():
+        claim["amount"] = hex(claim["amount"])
+    return data
+
+
+def test_verify_distribution(tree):
+    report = verify.verify(distribution(tree))
+    assert report["ok"]
+    assert report["claims"] == len(tree["claims"])
+    assert report["tokenTotal"]["actual"] == int(tree["tokenTotal"], 16)
+
+
+def test_parallel(tree, monkeypatch):
+    monkeypatch.setattr(verify, "PARALLEL_THRESHOLD", 1)
+    data = distribution(tree)
+    user = next(iter(data["claims"]))
+    data["claims"][user]["amount"] = hex(int(data["claims"][user]["amount"], 16) + 1)
+    report = verify.verify(data, workers=2, batch_size=100)
+    assert report["invalid"] == [user]
+
+
+def test_leaf_hash():
+    args = (7, "0x" + "ab" * 20, 10 ** 18)
+    packed = encode_abi_packed(["uint", "address", "uint"], args)
+    assert verify.leaf_hash(*args) == keccak(packed)
+
+
+def test_tampered(tree):
+    data = distribution(tree)
+    users = list(data["claims"])
+    data["claims"][users[0]]["proof"] = data["claims"][users[1]]["proof"]
+    data["claims"][users[2]]["index"] = data["claims"][users[3]]["index"]
+    missing = data["claims"][users[4]]["index"]
+    del data["claims"][users[4]]
+    report = verify.verify(data)
+    assert not report["ok"]
+    assert report["invalid"] == [users[0], users[2]]
+    assert report["collisions"] == {
+        data["claims"][users[3]]["index"]: [users[2], users[3]]
+    }
+    assert missing in report["missing"]
+    total = report["tokenTotal"]
+    assert total["expected"] - total["actual"] == tree["claims"][users[4]]["amount"]
+
+
+def test_root_mismatch(tree):
+    data = distribution(tree)
+    data["merkleRoot"] = encode_hex(b"\x00" * 32)
+    assert verify.verify(data)["invalid"] == list(data["claims"])
+
+
+def test_truncated_proof(tree):
+    data = distribution(tree)
+    user = "0x8f27eD02e6BF7C60f6ce1c1A0Dd0cb804aA5aDFC"
+    del data["claims"][user]["proof"][1]
+    assert verify.verify(data)["invalid"] == [user]
+
+
+def test_tampered_proofs_after_memo(tree):
+    root = bytes.fromhex(tree["merkleRoot"][2:])
+    verified = {}
+    claims = [
+        (claim["index"], user, claim["amount"], claim["proof"])
+        for user, claim in tree["claims"].items()
+    ]
+    for index, user, amount, proof in claims:
+        assert verify.verify_proof(
+            verify.leaf_hash(index, user, amount), proof, root, verified
+        )
+    for index, user, amount, proof in claims:
+        leaf = verify.leaf_hash(index, user, amount)
+        for depth in range(len(proof)):
+            truncated = proof[:depth] + proof[depth + 1 :]
+            assert not verify.verify_proof(leaf, truncated, root, verified)
+        for depth in range(len(proof) - 1):
+            if proof[depth] != proof[depth + 1]:
+                reordered = list(proof)
+                reordered[depth : depth + 2] = [proof[depth + 1], proof[depth]]
+                assert not verify.verify_proof(leaf, reordered, root, verified)